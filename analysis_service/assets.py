@@ -0,0 +1,87 @@
+"""Static assets served by the service itself, with immutable caching.
+
+An asset is written once under a name that contains its content digest,
+next to a gzip copy of it:
+
+    <root>/plotly-<digest>.min.js
+    <root>/plotly-<digest>.min.js.gz
+
+A changed asset gets a new name, so clients may cache it forever. The Plotly
+bundle is taken from the installed plotly package, pages load it without
+network access to a CDN. The Docker image builds the assets with
+`python assets.py`, the service only builds them itself when they are missing.
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+import threading
+from typing import NamedTuple
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Asset(NamedTuple):
+    name: str
+    path: str
+    gzip_path: str
+    etag: str
+    gzip_etag: str
+
+
+def publish_asset(root: str, name: str, content: bytes, compress: bool = True) -> Asset:
+    """Write `content` under a content-hashed version of `name`, once."""
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    stem, dot, suffix = name.partition(".")
+    hashed = f"{stem}-{digest}{dot}{suffix}"
+    asset = Asset(
+        hashed,
+        os.path.join(root, hashed),
+        os.path.join(root, f"{hashed}.gz"),
+        f'"{digest}"',
+        f'"{digest}-gzip"',
+    )
+
+    os.makedirs(root, exist_ok=True)
+    if not os.path.exists(asset.path):
+        _replace(asset.path, content)
+    if compress and not os.path.exists(asset.gzip_path):
+        # mtime=0 keeps the compressed copy identical between builds.
+        _replace(asset.gzip_path, gzip.compress(content, compresslevel=9, mtime=0))
+    return asset
+
+
+def publish_plotly_bundle(root: str) -> Asset:
+    from plotly.offline import get_plotlyjs
+
+    return publish_asset(root, "plotly.min.js", get_plotlyjs().encode())
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """True when `gzip` has a non-zero quality, an explicit `gzip` overrides `*`."""
+    qualities: dict[str, float] = {}
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _replace(path: str, content: bytes) -> None:
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(partial, "wb") as file:
+        file.write(content)
+    os.replace(partial, path)
+
+
+if __name__ == "__main__":
+    print(publish_plotly_bundle(sys.argv[1] if len(sys.argv) > 1 else "assets").path)
@@ -1,87 +1,86 @@
-import plotly.express as px
-import pandas as pd
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from assets import publish_plotly_bundle
 from db.models import OrganizationStatistics, OrganizationTypeStatistics
-from db.db import get_analysis_db
+from db.db import get_analysis_db, run_db
+from figures import render_dashboard
+from render_cache import RenderCache
+from settings import settings
 from sqlalchemy.orm import Session
 
+# Dashboards load Plotly from the service itself instead of a CDN.
+plotly_bundle = publish_plotly_bundle(settings.asset_path)
 
-class SimpleCharts:
-    @staticmethod
-    def get_chars(top_n: int) -> str:
-        session: Session = next(get_analysis_db())
-
-        # ---- Top N Organizations ----
-        org_stats = (
-            session.query(OrganizationStatistics)
-            .order_by(OrganizationStatistics.quantity.desc())
-            .limit(top_n)
-            .all()
-        )
-
-        df_orgs = pd.DataFrame(
-            [(org.organization_name, org.quantity) for org in org_stats],
-            columns=["Organization", "Studies"],
-        )
-
-        fig_bar = px.bar(
-            df_orgs,
-            x="Organization",
-            y="Studies",
-            title=f"Top {top_n} Organizations by Study Count",
-            text_auto=True,
-            color_discrete_sequence=["#1f77b4"],
-        )
-        fig_bar.update_layout(xaxis_tickangle=-45)
-
-        fig_pie = px.pie(
-            df_orgs,
-            names="Organization",
-            values="Studies",
-            title=f"Share of Studies in Top {top_n} Organizations",
-            color_discrete_sequence=px.colors.sequential.Blues,
-        )
 
-        # ---- Studies by Organization Type ----
-        org_type_stats = (
-            session.query(OrganizationTypeStatistics)
-            .order_by(OrganizationTypeStatistics.quantity_studies.desc())
-            .all()
-        )
+def _render_pool() -> ProcessPoolExecutor:
+    # Spawned rather than forked, the service has threads and open connections.
+    return ProcessPoolExecutor(
+        max_workers=settings.render_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
 
-        df_type_studies = pd.DataFrame(
-            [(row.organization_type, row.quantity_studies) for row in org_type_stats],
-            columns=["Organization Type", "Total Studies"],
-        )
 
-        fig_organization_type_1 = px.bar(
-            df_type_studies,
-            x="Organization Type",
-            y="Total Studies",
-            title="Total Studies per Organization Type",
-            text_auto=True,
-            color_discrete_sequence=["#2ca02c"],
-        )
-
-        # ---- Unique Orgs by Type ----
-        df_type_orgs = pd.DataFrame(
-            [
-                (row.organization_type, row.quantity_organizations)
-                for row in org_type_stats
-            ],
-            columns=["Organization Type", "Unique Organizations"],
-        )
+class SimpleCharts:
+    # Rendered dashboards and chart data by `top_n`, invalidated by every
+    # statistics sync.
+    cache = RenderCache(maxsize=settings.render_cache_size)
+    # At most ANALYSIS_RENDER_WORKERS dashboards are rendered at a time.
+    render_pool = _render_pool()
+
+    @classmethod
+    async def get_dashboard(cls, top_n: int) -> str:
+        return await cls.cache.get(("html", top_n), lambda: cls._render(top_n))
+
+    @classmethod
+    async def get_dashboard_data(cls, top_n: int) -> str:
+        return await cls.cache.get(("data", top_n), lambda: run_db(cls.get_data, top_n))
+
+    @classmethod
+    async def _render(cls, top_n: int) -> str:
+        organizations, types = await run_db(cls._load_statistics, top_n)
+        pool = cls.render_pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                pool,
+                render_dashboard,
+                top_n,
+                organizations,
+                types,
+                f"static/{plotly_bundle.name}",
+            )
+        except BrokenProcessPool:
+            # A worker died, e.g. killed for memory. The pool refuses all
+            # work from then on, later renders get a new one.
+            if cls.render_pool is pool:
+                cls.render_pool = _render_pool()
+            raise
 
-        fig_organization_type_2 = px.bar(
-            df_type_orgs,
-            x="Organization Type",
-            y="Unique Organizations",
-            title="Unique Organizations per Type",
-            text_auto=True,
-            color_discrete_sequence=["#d62728"],
-        )
+    @staticmethod
+    def _load_statistics(
+        top_n: int,
+    ) -> tuple[list[tuple[str, int]], list[tuple[str, int, int]]]:
+        session: Session = next(get_analysis_db())
 
-        # ---- Scatter Plot: 2 measures vs 1 dimension ----
-        df_scatter = pd.DataFrame(
+        try:
+            org_stats = (
+                session.query(OrganizationStatistics)
+                .order_by(OrganizationStatistics.quantity.desc())
+                .limit(top_n)
+                .all()
+            )
+            org_type_stats = (
+                session.query(OrganizationTypeStatistics)
+                .order_by(OrganizationTypeStatistics.quantity_studies.desc())
+                .all()
+            )
+        finally:
+            session.close()
+        return (
+            [(org.organization_name, org.quantity) for org in org_stats],
             [
                 (
                     row.organization_type,
@@ -90,69 +89,25 @@ class SimpleCharts:
                 )
                 for row in org_type_stats
             ],
-            columns=["Organization Type", "Total Studies", "Unique Organizations"],
-        )
-
-        fig_scatter = px.scatter(
-            df_scatter,
-            x="Total Studies",
-            y="Unique Organizations",
-            text="Organization Type",
-            title="Studies vs Unique Organizations per Type",
-            color="Organization Type",
-            size_max=60,
         )
-        fig_scatter.update_traces(textposition="top center")
 
-        # ---- HTML Template ----
-        html = f"""
-        <html>
-        <head>
-            <title>Analytics Dashboard</title>
-            <style>
-                .grid {{
-                    display: flex;
-                    justify-content: space-around;
-                    flex-wrap: wrap;
-                }}
-                .chart {{
-                    width: 48%;
-                    min-width: 300px;
-                    margin-bottom: 40px;
-                }}
-                .fullwidth {{
-                    width: 98%;
-                    margin: 0 auto 40px auto;
-                }}
-            </style>
-        </head>
-        <body>
-            <h1>📊 Simple Analytics Dashboard</h1>
-            <p>Showing top {top_n} organizations. Try changing <code>?top=15</code> in URL.</p>
+    @classmethod
+    def get_data(cls, top_n: int) -> str:
+        """Series of all dashboard charts as compact JSON, one array per column.
 
-            <div class="grid">
-                <div class="chart">
-                {fig_bar.to_html(full_html=False, include_plotlyjs='cdn')}
-            </div>
-                <div class="chart">
-                {fig_pie.to_html(full_html=False, include_plotlyjs=False)}
-                </div>
-            </div>
-
-            <div class="grid">
-                <div class="chart">
-                    {fig_organization_type_1.to_html(full_html=False, include_plotlyjs=False)}
-                </div>
-                <div class="chart">
-                    {fig_organization_type_2.to_html(full_html=False, include_plotlyjs=False)}
-                </div>
-            </div>
-
-            <div class="fullwidth">
-                {fig_scatter.to_html(full_html=False, include_plotlyjs=False)}
-            </div>
-        </body>
-        </html>
+        `static/dashboard.html` draws the charts from it in the browser.
         """
-
-        return html
+        organizations, types = cls._load_statistics(top_n)
+        data = {
+            "top": top_n,
+            "organizations": {
+                "name": [name for name, _ in organizations],
+                "studies": [studies for _, studies in organizations],
+            },
+            "types": {
+                "type": [type_ for type_, _, _ in types],
+                "studies": [studies for _, studies, _ in types],
+                "organizations": [count for _, _, count in types],
+            },
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
@@ -1,4 +1,6 @@
-from typing import Generator
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Generator, TypeVar
 from sqlalchemy.orm import Session
 
 from sqlalchemy import create_engine
@@ -15,6 +17,19 @@ analysis_engine_session = sessionmaker(
 
 Base = declarative_base()
 
+T = TypeVar("T")
+
+# Sessions block, so they are used from a bounded pool of threads and the
+# event loop keeps serving requests while a query runs.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.db_workers, thread_name_prefix="db"
+)
+
+
+async def run_db(func: Callable[..., T], *args: Any) -> T:
+    """Run blocking database work in `db_executor`."""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
 
 def get_main_db() -> Generator[Session, None, None]:
     db = main_db_session()
@@ -1,17 +1,25 @@
 from datetime import datetime
 
-from sqlalchemy import Integer
+from sqlalchemy import ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.types import String, DateTime
 from db.db import Base
 
 
+class Organization(Base):  # type: ignore[misc]
+    __tablename__ = "organizations"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(1024), nullable=True)
+    type: Mapped[str] = mapped_column(String(1024), nullable=True)
+
+
 class Study(Base):  # type: ignore[misc]
     __tablename__ = "studies"
     id: Mapped[str] = mapped_column(String(1024), primary_key=True)
     title: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_name: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_type: Mapped[str] = mapped_column(String(1024), nullable=True)
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id"), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now
     )
@@ -35,3 +43,29 @@ class OrganizationTypeStatistics(Base):  # type: ignore[misc]
     )
     quantity_studies: Mapped[int] = mapped_column(Integer)
     quantity_organizations: Mapped[int] = mapped_column(Integer)
+
+
+class OrganizationCount(Base):  # type: ignore[misc]
+    """Studies per organization id, the basis of both statistics tables."""
+
+    __tablename__ = "organization_counts"
+    organization_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(1024), nullable=True)
+    type: Mapped[str] = mapped_column(String(1024), nullable=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class StudyContribution(Base):  # type: ignore[misc]
+    """The organization each study is currently counted for."""
+
+    __tablename__ = "study_contributions"
+    study_id: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    organization_id: Mapped[int] = mapped_column(Integer, nullable=True)
+
+
+class SyncState(Base):  # type: ignore[misc]
+    __tablename__ = "sync_state"
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # `studies.updated_at` up to which changes were applied
+    watermark: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    last_full_sync_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,86 @@
+"""Delta arithmetic of the incremental statistics sync.
+
+The functions are pure, `tasks.py` reads their inputs from and writes their
+results to the databases. Applying the deltas must leave the same statistics
+as rebuilding them from the whole `studies` table:
+
+- `organization_counts` has one row per organization with studies,
+- `organization_statistics` sums the counts by organization name,
+- `organization_type_statistics` sums the counts by organization type and
+  counts the named organizations of each type.
+
+Rows whose quantity drops to zero are deleted.
+"""
+
+from collections import Counter
+from typing import Iterable, Mapping, NamedTuple
+
+# (name, type, quantity) of one organization in `organization_counts`.
+OrganizationCount = tuple[str | None, str | None, int]
+
+
+class StudyDeltas(NamedTuple):
+    # Study count change per organization id.
+    organizations: Counter[int]
+    # (study id, organization id) of the studies whose organization changed.
+    moved: list[tuple[str, int | None]]
+
+
+class StatisticsDeltas(NamedTuple):
+    # New count of every organization with a non-zero delta.
+    counts: dict[int, OrganizationCount]
+    # Changes of `organization_statistics.quantity` by name.
+    organizations: Counter[str]
+    # Changes of `organization_type_statistics` by type.
+    type_studies: Counter[str]
+    type_organizations: Counter[str]
+
+
+def study_deltas(
+    previous: Mapping[str, int | None],
+    studies: Iterable[tuple[str, int | None]],
+) -> StudyDeltas:
+    """Move the count of each study from its previous organization to its current one.
+
+    `previous` maps the ids of studies already counted to the organization
+    they were counted for. Studies read again with an unchanged organization,
+    e.g. in the overlap window, produce no change.
+    """
+    deltas: Counter[int] = Counter()
+    moved = []
+    for study_id, organization_id in studies:
+        if study_id in previous:
+            if previous[study_id] == organization_id:
+                continue
+            if previous[study_id] is not None:
+                deltas[previous[study_id]] -= 1
+        if organization_id is not None:
+            deltas[organization_id] += 1
+        moved.append((study_id, organization_id))
+    return StudyDeltas(deltas, moved)
+
+
+def statistics_deltas(
+    counts: Mapping[int, OrganizationCount], deltas: Mapping[int, int]
+) -> StatisticsDeltas:
+    """Apply per-organization study deltas to the counts and derive both statistics.
+
+    `counts` holds the current count of every organization in `deltas`,
+    with a quantity of 0 for organizations not counted yet. Organizations
+    missing from it are skipped.
+    """
+    result = StatisticsDeltas({}, Counter(), Counter(), Counter())
+    for org_id, delta in deltas.items():
+        if not delta or org_id not in counts:
+            continue
+        name, type_, before = counts[org_id]
+        after = before + delta
+        result.counts[org_id] = (name, type_, after)
+        if name is not None:
+            result.organizations[name] += delta
+        if type_ is not None:
+            result.type_studies[type_] += delta
+            # An organization counts for its type while it has studies.
+            if name is not None and (before > 0) != (after > 0):
+                result.type_organizations[type_] += 1 if after > 0 else -1
+    return result
@@ -0,0 +1,166 @@
+"""Dashboard figures, built in worker processes.
+
+Building the figures is CPU-bound and holds the GIL for the whole render, so
+the service runs `render_dashboard` in a process pool. The module only
+depends on plotly and pandas and takes plain rows, which keeps it cheap to
+import in a worker and its arguments cheap to pickle.
+"""
+
+import plotly.express as px
+import pandas as pd
+
+
+def render_dashboard(
+    top_n: int,
+    organizations: list[tuple[str, int]],
+    types: list[tuple[str, int, int]],
+    plotly_src: str,
+) -> str:
+    """The whole dashboard page.
+
+    `organizations` are (name, studies) rows of the top organizations and
+    `types` are (type, studies, organizations) rows, both sorted by studies.
+    """
+    # ---- Top N Organizations ----
+
+    df_orgs = pd.DataFrame(
+        organizations,
+        columns=["Organization", "Studies"],
+    )
+
+    fig_bar = px.bar(
+        df_orgs,
+        x="Organization",
+        y="Studies",
+        title=f"Top {top_n} Organizations by Study Count",
+        text_auto=True,
+        color_discrete_sequence=["#1f77b4"],
+    )
+    fig_bar.update_layout(xaxis_tickangle=-45)
+
+    fig_pie = px.pie(
+        df_orgs,
+        names="Organization",
+        values="Studies",
+        title=f"Share of Studies in Top {top_n} Organizations",
+        color_discrete_sequence=px.colors.sequential.Blues,
+    )
+
+    # ---- Studies by Organization Type ----
+    df_type_studies = pd.DataFrame(
+        [(type_, studies) for type_, studies, _ in types],
+        columns=["Organization Type", "Total Studies"],
+    )
+
+    fig_organization_type_1 = px.bar(
+        df_type_studies,
+        x="Organization Type",
+        y="Total Studies",
+        title="Total Studies per Organization Type",
+        text_auto=True,
+        color_discrete_sequence=["#2ca02c"],
+    )
+
+    # ---- Unique Orgs by Type ----
+    df_type_orgs = pd.DataFrame(
+        [(type_, organizations) for type_, _, organizations in types],
+        columns=["Organization Type", "Unique Organizations"],
+    )
+
+    fig_organization_type_2 = px.bar(
+        df_type_orgs,
+        x="Organization Type",
+        y="Unique Organizations",
+        title="Unique Organizations per Type",
+        text_auto=True,
+        color_discrete_sequence=["#d62728"],
+    )
+
+    # ---- Scatter Plot: 2 measures vs 1 dimension ----
+    df_scatter = pd.DataFrame(
+        types,
+        columns=["Organization Type", "Total Studies", "Unique Organizations"],
+    )
+
+    fig_scatter = px.scatter(
+        df_scatter,
+        x="Total Studies",
+        y="Unique Organizations",
+        text="Organization Type",
+        title="Studies vs Unique Organizations per Type",
+        color="Organization Type",
+        size_max=60,
+    )
+    fig_scatter.update_traces(textposition="top center")
+
+    # Fixed div ids keep the page identical while the data is unchanged.
+    fig_bar_html = fig_bar.to_html(
+        full_html=False,
+        div_id="top-organizations",
+        include_plotlyjs=plotly_src,
+    )
+    fig_pie_html = fig_pie.to_html(
+        full_html=False, div_id="top-organizations-share", include_plotlyjs=False
+    )
+    fig_organization_type_1_html = fig_organization_type_1.to_html(
+        full_html=False, div_id="studies-per-type", include_plotlyjs=False
+    )
+    fig_organization_type_2_html = fig_organization_type_2.to_html(
+        full_html=False, div_id="organizations-per-type", include_plotlyjs=False
+    )
+    fig_scatter_html = fig_scatter.to_html(
+        full_html=False, div_id="studies-vs-organizations", include_plotlyjs=False
+    )
+
+    # ---- HTML Template ----
+    html = f"""
+    <html>
+    <head>
+        <title>Analytics Dashboard</title>
+        <style>
+            .grid {{
+                display: flex;
+                justify-content: space-around;
+                flex-wrap: wrap;
+            }}
+            .chart {{
+                width: 48%;
+                min-width: 300px;
+                margin-bottom: 40px;
+            }}
+            .fullwidth {{
+                width: 98%;
+                margin: 0 auto 40px auto;
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>📊 Simple Analytics Dashboard</h1>
+        <p>Showing top {top_n} organizations. Try changing <code>?top=15</code> in URL.</p>
+
+        <div class="grid">
+            <div class="chart">
+            {fig_bar_html}
+        </div>
+            <div class="chart">
+            {fig_pie_html}
+            </div>
+        </div>
+
+        <div class="grid">
+            <div class="chart">
+                {fig_organization_type_1_html}
+            </div>
+            <div class="chart">
+                {fig_organization_type_2_html}
+            </div>
+        </div>
+
+        <div class="fullwidth">
+            {fig_scatter_html}
+        </div>
+    </body>
+    </html>
+    """
+
+    return html
@@ -0,0 +1,88 @@
+import asyncio
+
+import psycopg2
+import psycopg2.extensions
+
+CHANNEL = "studies_changed"
+
+
+class ChangeListener:
+    """LISTEN for change notifications from the main database.
+
+    The connection is driven by the event loop, which wakes up only when the
+    server sends something, so an idle database costs nothing. `changed` is
+    set on every notification and after each (re)connect, because
+    notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANNEL) -> None:
+        self.dsn = dsn
+        self.channel = channel
+        self.changed = asyncio.Event()
+
+    async def run(self, reconnect_delay: float = 5.0) -> None:
+        while True:
+            try:
+                await self._listen()
+            except psycopg2.Error as e:
+                print(f"Listening on {self.channel} FAILED: {e}")
+            await asyncio.sleep(reconnect_delay)
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Keepalives detect a silently dropped connection, which would
+        # otherwise never become readable again.
+        connection = await asyncio.to_thread(
+            psycopg2.connect,
+            self.dsn,
+            keepalives=1,
+            keepalives_idle=60,
+            keepalives_interval=10,
+            keepalives_count=3,
+        )
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        closed = loop.create_future()
+
+        def on_readable() -> None:
+            try:
+                connection.poll()
+            except psycopg2.Error as e:
+                if not closed.done():
+                    closed.set_exception(e)
+                return
+            if connection.notifies:
+                connection.notifies.clear()
+                self.changed.set()
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            print(f"Listening on {self.channel}.")
+            self.changed.set()
+            loop.add_reader(connection.fileno(), on_readable)
+            try:
+                await closed
+            finally:
+                loop.remove_reader(connection.fileno())
+        finally:
+            connection.close()
+
+
+async def debounce(changed: asyncio.Event, quiet: float, max_delay: float) -> None:
+    """Wait until `changed` stays unset for `quiet` s, but no longer than `max_delay` s.
+
+    A crawl writes a page every few seconds, so waiting for a quiet period
+    alone could postpone the refresh for the whole crawl. `changed` is clear
+    on return.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_delay
+    while True:
+        changed.clear()
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=min(quiet, remaining))
+        except asyncio.TimeoutError:
+            return
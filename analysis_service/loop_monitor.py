@@ -0,0 +1,46 @@
+import asyncio
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up a sleeping task.
+
+    Every `interval` seconds the monitor sleeps and compares when it woke up
+    with when it was due. The difference is time the loop spent running
+    something else, usually blocking code, during which no request was
+    served. Lags of `warn_after` seconds or more are printed as stalls.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_after: float = 0.1) -> None:
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = 0
+        self.stalls = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - due))
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.last = lag
+        self.max = max(self.max, lag)
+        self.total += lag
+        if lag >= self.warn_after:
+            self.stalls += 1
+            print(f"Event loop STALLED for {lag * 1000:.0f} ms.")
+
+    def report(self) -> dict[str, float | int]:
+        mean = self.total / self.samples if self.samples else 0.0
+        return {
+            "last_ms": round(self.last * 1000, 1),
+            "mean_ms": round(mean * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "stalls": self.stalls,
+            "samples": self.samples,
+        }
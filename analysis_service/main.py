@@ -1,38 +1,200 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 
 import asyncio
+import contextlib
+import mimetypes
+import os
 from contextlib import asynccontextmanager
 
-from charts import SimpleCharts
-from tasks import data_sync_task
+from assets import IMMUTABLE, accepts_gzip, publish_asset
+from charts import SimpleCharts, plotly_bundle
+from db.db import db_executor, run_db
+from listener import ChangeListener, debounce
+from loop_monitor import LoopLagMonitor
+from settings import settings
+from sqlalchemy.exc import SQLAlchemyError
+from snapshots import (
+    DashboardSnapshots,
+    Snapshot,
+    content_digest,
+    etag_matches,
+    file_snapshot,
+)
+from tasks import data_sync_task, init_sync_schema
+
+snapshots = DashboardSnapshots(settings.snapshot_path)
+loop_lag = LoopLagMonitor(settings.loop_lag_interval, settings.loop_lag_warning)
+
+
+def _publish_dashboard_page() -> Snapshot:
+    """The static dashboard page, pointing at the current Plotly bundle."""
+    with open(
+        os.path.join(os.path.dirname(__file__), "static", "dashboard.html"), "rb"
+    ) as file:
+        page = file.read().replace(
+            b"static/plotly.min.js", f"static/{plotly_bundle.name}".encode()
+        )
+    return file_snapshot(
+        publish_asset(settings.asset_path, "dashboard.html", page, compress=False).path
+    )
+
+
+# The dashboard page is static, it draws the charts from `/data`.
+dashboard_page = _publish_dashboard_page()
+static_assets = {plotly_bundle.name: plotly_bundle}
 
 
 # ======= Background async task ========
 async def background_worker() -> None:
-    while True:
-        print("Background task started!")
+    if not settings.listen_for_changes:
+        while True:
+            await _sync_and_publish()
+            await asyncio.sleep(settings.sync_interval)
+
+    listener = ChangeListener(settings.MAIN_DATABASE_URL)
+    listen_task = asyncio.create_task(listener.run())
+    try:
+        while True:
+            # Idle until studies change. The timeout still runs the periodic
+            # full sync when nothing was written for a long time.
+            try:
+                await asyncio.wait_for(
+                    listener.changed.wait(), timeout=settings.full_sync_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            await debounce(
+                listener.changed, settings.sync_debounce, settings.sync_max_delay
+            )
+            await _sync_and_publish()
+    finally:
+        listen_task.cancel()
+
+
+async def _sync_and_publish() -> None:
+    print("Background task started!")
+    try:
         await data_sync_task()
-        print("Background task finished.")
-        await asyncio.sleep(60)
+        await publish_snapshots()
+    except (SQLAlchemyError, OSError) as e:
+        # The worker keeps running, the next iteration tries again.
+        print(f"Background task FAILED: {e}")
+        return
+    print("Background task finished.")
+
+
+async def publish_snapshots() -> None:
+    """Write the dashboard data for ANALYSIS_SNAPSHOT_TOP to disk."""
+    await asyncio.to_thread(snapshots.retain, settings.snapshot_top)
+    for top_n in settings.snapshot_top:
+        # Unchanged statistics come from the render cache, and unchanged
+        # data keeps its ETag.
+        data = await SimpleCharts.get_dashboard_data(top_n)
+        await asyncio.to_thread(snapshots.write, top_n, data)
 
 
 @asynccontextmanager  # type: ignore[arg-type]
 async def lifespan(app: FastAPI) -> None:  # type: ignore[misc]
+    await run_db(init_sync_schema)
+    monitor_task = asyncio.create_task(loop_lag.run())
     bg_task = asyncio.create_task(background_worker())
     yield
+    monitor_task.cancel()
     bg_task.cancel()
     try:
         await bg_task
     except asyncio.CancelledError:
         print("Background task was cancelled")
+    with contextlib.suppress(asyncio.CancelledError):
+        await monitor_task
+    # Joining the pools blocks until running jobs finish, off the loop.
+    await asyncio.to_thread(SimpleCharts.render_pool.shutdown, cancel_futures=True)
+    await asyncio.to_thread(db_executor.shutdown, cancel_futures=True)
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+def _send_file(request: Request, snapshot: Snapshot, media_type: str) -> Response:
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": snapshot.last_modified,
+        "Cache-Control": "no-cache",
+    }
+    if snapshot.is_fresh(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+    ):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(snapshot.path, media_type=media_type, headers=headers)
+
+
 @app.get("/", response_class=HTMLResponse)  # type: ignore[misc]
-async def root(request: Request) -> HTMLResponse:
+async def root(request: Request) -> Response:
+    return _send_file(request, dashboard_page, "text/html")
+
+
+@app.get("/data")  # type: ignore[misc]
+async def data(request: Request) -> Response:
+    """Series of all dashboard charts for the top `top` organizations."""
     top_n = int(request.query_params.get("top", 10))
-    content = SimpleCharts.get_chars(top_n)
+
+    # Pointers of values dropped from ANALYSIS_SNAPSHOT_TOP may still be on
+    # disk until the next sync, they are not served.
+    snapshot = snapshots.get(top_n) if top_n in settings.snapshot_top else None
+    if snapshot is not None:
+        return _send_file(request, snapshot, "application/json")
+
+    # Other `top` values are built on demand.
+    content = (await SimpleCharts.get_dashboard_data(top_n)).encode()
+    headers = {"ETag": f'"{content_digest(content)}"', "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
+
+
+@app.get("/static/{name}")  # type: ignore[misc]
+async def static_asset(name: str, request: Request) -> Response:
+    """Content-hashed assets, cached by clients without ever revalidating."""
+    asset = static_assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404)
+
+    headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+    path = asset.path
+    etag = asset.etag
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        path = asset.gzip_path
+        etag = asset.gzip_etag
+        headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    media_type = mimetypes.guess_type(name)[0]
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@app.get("/charts", response_class=HTMLResponse)  # type: ignore[misc]
+async def charts(request: Request) -> Response:
+    """The dashboard rendered on the server, for clients without JavaScript."""
+    top_n = int(request.query_params.get("top", 10))
+    content = await SimpleCharts.get_dashboard(top_n)
     return HTMLResponse(content=content)
+
+
+@app.get("/metrics")  # type: ignore[misc]
+async def metrics() -> JSONResponse:
+    """Event loop lag and render cache counters of this replica."""
+    return JSONResponse(
+        {
+            "event_loop_lag": loop_lag.report(),
+            "render_cache": {
+                "hits": SimpleCharts.cache.hits,
+                "misses": SimpleCharts.cache.misses,
+            },
+        }
+    )
@@ -0,0 +1,62 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+
+class RenderCache:
+    """Rendered pages keyed by a page key and the version of the data.
+
+    `bump()` is called whenever the data changed, which makes every cached
+    page stale at once. At most `maxsize` pages are kept, the least recently
+    used one is dropped first. Concurrent requests for a page that is not
+    cached share one render instead of starting one each.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        self.maxsize = maxsize
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._pages: OrderedDict[tuple[Hashable, int], str] = OrderedDict()
+        self._rendering: dict[tuple[Hashable, int], asyncio.Task[str]] = {}
+
+    def bump(self) -> None:
+        self.version += 1
+        # Pages of older versions can never be hit again.
+        self._pages.clear()
+
+    async def get(self, key: Hashable, render: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached page for `key`, awaiting `render()` if needed.
+
+        `render` must not block the event loop, it runs the work in a thread
+        or a worker process.
+        """
+        entry = (key, self.version)
+        page = self._pages.get(entry)
+        if page is not None:
+            self._pages.move_to_end(entry)
+            self.hits += 1
+            return page
+
+        task = self._rendering.get(entry)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._render(entry, render))
+            self._rendering[entry] = task
+        # A viewer that goes away does not cancel the render for the others.
+        return await asyncio.shield(task)
+
+    async def _render(
+        self, entry: tuple[Hashable, int], render: Callable[[], Awaitable[str]]
+    ) -> str:
+        try:
+            page = await render()
+        finally:
+            del self._rendering[entry]
+
+        # A page rendered while the data changed is not stored.
+        if entry[1] == self.version:
+            self._pages[entry] = page
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        return page
@@ -0,0 +1,143 @@
+"""Dashboard data built at sync time and served from disk.
+
+Each chart data payload is stored once under its content digest, and a small
+pointer file per `top` value names the current page with its ETag and
+Last-Modified time:
+
+    <root>/data-top10.json
+    <root>/pages/<digest>.json
+
+Pages and pointers are written under a temporary name and renamed, so a
+reader, possibly another replica sharing the directory, never sees a partial
+file or a pointer to a page that is not there yet.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Collection, NamedTuple
+
+# Pages that lost their pointer are kept a little longer for readers that
+# resolved the pointer just before it moved.
+_PRUNE_AFTER = 300
+
+
+class Snapshot(NamedTuple):
+    path: str
+    etag: str
+    last_modified: str
+
+    def is_fresh(
+        self, if_none_match: str | None, if_modified_since: str | None
+    ) -> bool:
+        """True when the client's cached copy is current, answered with a 304."""
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return parsedate_to_datetime(self.last_modified) <= since
+        return False
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def file_snapshot(path: str) -> Snapshot:
+    """Validators for a file that is served as is, like a static page."""
+    with open(path, "rb") as file:
+        etag = f'"{content_digest(file.read())}"'
+    return Snapshot(path, etag, formatdate(os.path.getmtime(path), usegmt=True))
+
+
+class DashboardSnapshots:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.pages = os.path.join(root, "pages")
+        os.makedirs(self.pages, exist_ok=True)
+
+    def pointer_path(self, top_n: int) -> str:
+        return os.path.join(self.root, f"data-top{top_n}.json")
+
+    def get(self, top_n: int) -> Snapshot | None:
+        try:
+            with open(self.pointer_path(top_n), encoding="utf-8") as file:
+                pointer = json.load(file)
+        except FileNotFoundError:
+            return None
+        return Snapshot(
+            os.path.join(self.pages, pointer["page"]),
+            pointer["etag"],
+            pointer["last_modified"],
+        )
+
+    def write(self, top_n: int, data: str) -> Snapshot:
+        """Publish the chart data for `top_n`, a no-op if it did not change."""
+        content = data.encode()
+        digest = content_digest(content)
+        etag = f'"{digest}"'
+        current = self.get(top_n)
+        if current is not None and current.etag == etag:
+            return current
+
+        page = f"{digest}.json"
+        self._replace(os.path.join(self.pages, page), content)
+        snapshot = Snapshot(
+            os.path.join(self.pages, page), etag, formatdate(time.time(), usegmt=True)
+        )
+        pointer = {"page": page, "etag": etag, "last_modified": snapshot.last_modified}
+        self._replace(self.pointer_path(top_n), json.dumps(pointer).encode())
+        self._prune()
+        return snapshot
+
+    def retain(self, tops: Collection[int]) -> None:
+        """Delete the pointers of `top` values other than `tops`.
+
+        Their pages are pruned with the next write.
+        """
+        for name in os.listdir(self.root):
+            if not (name.startswith("data-top") and name.endswith(".json")):
+                continue
+            top = name.removeprefix("data-top").removesuffix(".json")
+            if top.isdigit() and int(top) not in tops:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue
+
+    def _replace(self, path: str, content: bytes) -> None:
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(partial, "wb") as file:
+            file.write(content)
+        os.replace(partial, path)
+
+    def _prune(self) -> None:
+        referenced = set()
+        for name in os.listdir(self.root):
+            if name.startswith("data-top") and name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.root, name), encoding="utf-8") as file:
+                        referenced.add(json.load(file)["page"])
+                except (FileNotFoundError, ValueError):
+                    continue
+
+        cutoff = time.time() - _PRUNE_AFTER
+        for name in os.listdir(self.pages):
+            path = os.path.join(self.pages, name)
+            if name not in referenced and name.endswith(".json"):
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
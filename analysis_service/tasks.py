@@ -1,103 +1,414 @@
-from typing import Any, Sequence
+import csv
+import io
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Sequence
 
+from charts import SimpleCharts
+from deltas import statistics_deltas, study_deltas
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
-from db.models import Study, OrganizationStatistics, OrganizationTypeStatistics
-from db.db import get_main_db, get_analysis_db
+from db.models import (
+    Organization,
+    OrganizationCount,
+    Study,
+    StudyContribution,
+    SyncState,
+    OrganizationStatistics,
+    OrganizationTypeStatistics,
+)
+from db.db import analysis_engine, get_main_db, get_analysis_db, run_db
+from settings import settings
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, distinct, Row
+from sqlalchemy import Select, select, func, text, tuple_, Row
+
+SYNC_NAME = "organization_statistics"
+
+# Tables the analysis service keeps for itself, next to the statistics.
+_SYNC_TABLES = [
+    OrganizationCount.__table__,
+    StudyContribution.__table__,
+    SyncState.__table__,
+]
+
+
+def init_sync_schema() -> None:
+    OrganizationCount.metadata.create_all(bind=analysis_engine, tables=_SYNC_TABLES)
 
 
 async def data_sync_task() -> None:
-    org_stat_rows, org_type_stat_rows = await _update_organisation_statistics_data()
-    await _update_analytics_data(org_stat_rows, org_type_stat_rows)
+    """Bring the organization statistics up to date with `studies`.
+
+    Only studies updated since the stored watermark are read, and each one
+    moves its count from the organization it was counted for to its current
+    one. Every ANALYSIS_FULL_SYNC_INTERVAL seconds the statistics are rebuilt
+    from the whole table instead, which also catches deleted studies and any
+    drift of the incremental counts. The queries run in the database threads,
+    not on the event loop.
+    """
+    state = await run_db(_load_sync_state)
+    full_sync_due = (
+        state is None
+        or state.watermark is None
+        or state.last_full_sync_at is None
+        or datetime.now() - state.last_full_sync_at
+        >= timedelta(seconds=settings.full_sync_interval)
+    )
+    if full_sync_due:
+        if await run_db(_reconcile):
+            SimpleCharts.cache.bump()
+    else:
+        # Changes committed after the last sync can carry an earlier
+        # `updated_at`, they are read again with the overlap. Studies that
+        # were already applied produce no change.
+        overlap = timedelta(seconds=settings.sync_overlap_seconds)
+        await _sync_changes(state.watermark - overlap, settings.sync_batch_size)
+
+
+def _load_sync_state() -> SyncState | None:
+    session: Session = next(get_analysis_db())
+    try:
+        state = session.get(SyncState, SYNC_NAME)
+        if state is not None:
+            session.expunge(state)
+        return state
+    finally:
+        session.close()
 
 
-async def _update_organisation_statistics_data() -> (
-    tuple[Sequence[Row[tuple[str, Any]]], Sequence[Row[tuple[str, Any, Any]]]]
-):
+async def _sync_changes(since: datetime, batch_size: int) -> None:
+    print("Incremental analytics update STARTED!")
     main_db_session: Session = next(get_main_db())
+    after: tuple[datetime, str] | None = None
+    read = applied = 0
 
-    query_organization_statistics = (
-        select(Study.organization_name, func.count(Study.id).label("quantity"))
-        .group_by(Study.organization_name)
-        .order_by(func.count(Study.id).desc())
-    )
+    try:
+        while True:
+            # Keyset pagination, a page of studies shares one `updated_at`.
+            query = (
+                select(Study.id, Study.organization_id, Study.updated_at)
+                .where(Study.updated_at >= since)
+                .order_by(Study.updated_at, Study.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                query = query.where(tuple_(Study.updated_at, Study.id) > tuple_(*after))
+            studies = await run_db(_fetch_all, main_db_session, query)
+            if not studies:
+                break
 
-    organization_statistics_rows = main_db_session.execute(
-        query_organization_statistics
-    ).all()
+            read += len(studies)
+            moved = await run_db(_apply_changes, main_db_session, studies)
+            if moved:
+                # Dashboards rendered before this batch are stale now.
+                SimpleCharts.cache.bump()
+            applied += moved
+            after = (studies[-1].updated_at, studies[-1].id)
+            if len(studies) < batch_size:
+                break
 
-    query_organization_type_statistics = (
-        select(
-            Study.organization_type,
-            func.count(Study.id).label("quantity_studies"),
-            func.count(distinct(Study.organization_name)).label(
-                "quantity_organizations"
-            ),
-        )
-        .group_by(Study.organization_type)
-        .order_by(func.count(Study.id).desc())
-    )
+        print(f"Incremental analytics update SUCCEEDED: {applied} of {read} changed.")
 
-    query_organization_type_statistics_rows = main_db_session.execute(
-        query_organization_type_statistics
-    ).all()
+    except SQLAlchemyError as e:
+        print(f"Incremental analytics update FAILED: {e}")
+    finally:
+        await run_db(main_db_session.close)
 
-    return organization_statistics_rows, query_organization_type_statistics_rows
 
+def _fetch_all(session: Session, query: Select[Any]) -> Sequence[Row[Any]]:
+    return session.execute(query).all()
 
-async def _update_analytics_data(
-    org_stat_rows: Sequence[Row[tuple[str, Any]]],
-    org_type_stat_rows: Sequence[Row[tuple[str, Any]]],
-) -> None:
-    print("Bulk analytics update STARTED!")
+
+def _apply_changes(main_db_session: Session, studies: Sequence[Row[Any]]) -> int:
+    """Apply a batch of changed studies as deltas, returns the studies that moved."""
     session: Session = next(get_analysis_db())
 
     try:
         with session.begin():
+            previous = dict(
+                session.execute(
+                    text(
+                        "SELECT study_id, organization_id FROM study_contributions"
+                        " WHERE study_id = ANY(:ids)"
+                    ),
+                    {"ids": [study.id for study in studies]},
+                ).all()
+            )
 
-            # Bulk insert for OrganizationStatistics
-            org_stat_data = [
-                {"organization_name": org_name, "quantity": quantity}
-                for org_name, quantity in org_stat_rows
-                if org_name is not None
-            ]
+            deltas, moved = study_deltas(
+                previous, ((study.id, study.organization_id) for study in studies)
+            )
 
-            if org_stat_data:
-                _insert_query = pg_insert(OrganizationStatistics).values(org_stat_data)
-                _insert_query = _insert_query.on_conflict_do_update(
-                    index_elements=["organization_name"],
-                    set_={"quantity": _insert_query.excluded.quantity},
+            if moved:
+                _insert_query = pg_insert(StudyContribution).values(
+                    [
+                        {"study_id": study_id, "organization_id": organization_id}
+                        for study_id, organization_id in moved
+                    ]
                 )
-                session.execute(_insert_query)
+                session.execute(
+                    _insert_query.on_conflict_do_update(
+                        index_elements=["study_id"],
+                        set_={
+                            "organization_id": _insert_query.excluded.organization_id
+                        },
+                    )
+                )
+            _apply_deltas(main_db_session, session, deltas)
+
+            watermark = max(study.updated_at for study in studies)
+            state = session.get(SyncState, SYNC_NAME)
+            state.watermark = max(state.watermark, watermark)
+
+        return len(moved)
+    finally:
+        session.close()
+
+
+def _apply_deltas(
+    main_db_session: Session, session: Session, deltas: Counter[int]
+) -> None:
+    """Add per-organization study deltas to the counts and both statistics."""
+    ids = [org_id for org_id, delta in deltas.items() if delta]
+    if not ids:
+        return
+
+    counts = {
+        row.organization_id: (row.name, row.type, row.quantity)
+        for row in session.execute(
+            select(OrganizationCount).where(OrganizationCount.organization_id.in_(ids))
+        ).scalars()
+    }
+    new_ids = [org_id for org_id in ids if org_id not in counts]
+    if new_ids:
+        for org_id, name, type_ in main_db_session.execute(
+            select(Organization.id, Organization.name, Organization.type).where(
+                Organization.id.in_(new_ids)
+            )
+        ):
+            counts[org_id] = (name, type_, 0)
+
+    changes = statistics_deltas(counts, deltas)
+    org_stat_deltas = changes.organizations
+    type_study_deltas = changes.type_studies
+    type_organization_deltas = changes.type_organizations
 
-            # Bulk insert for OrganizationTypeStatistics
-            org_type_stat_data = [
+    if changes.counts:
+        _insert_query = pg_insert(OrganizationCount).values(
+            [
                 {
-                    "organization_type": org_type,
-                    "quantity_studies": quantity_studies,
-                    "quantity_organizations": quantity_orgs,
+                    "organization_id": org_id,
+                    "name": name,
+                    "type": type_,
+                    "quantity": quantity,
                 }
-                for org_type, quantity_studies, quantity_orgs in org_type_stat_rows
-                if org_type is not None
+                for org_id, (name, type_, quantity) in changes.counts.items()
             ]
+        )
+        session.execute(
+            _insert_query.on_conflict_do_update(
+                index_elements=["organization_id"],
+                set_={"quantity": _insert_query.excluded.quantity},
+            )
+        )
+    session.execute(
+        text(
+            "DELETE FROM organization_counts"
+            " WHERE organization_id = ANY(:ids) AND quantity <= 0"
+        ),
+        {"ids": ids},
+    )
 
-            if org_type_stat_data:
-                _insert_query = pg_insert(OrganizationTypeStatistics).values(
-                    org_type_stat_data
-                )
-                _insert_query = _insert_query.on_conflict_do_update(
-                    index_elements=["organization_type"],
-                    set_={
-                        "quantity_studies": _insert_query.excluded.quantity_studies,
-                        "quantity_organizations": _insert_query.excluded.quantity_organizations,
-                    },
-                )
-                session.execute(_insert_query)
+    if org_stat_deltas:
+        _insert_query = pg_insert(OrganizationStatistics).values(
+            [
+                {"organization_name": name, "quantity": delta}
+                for name, delta in org_stat_deltas.items()
+            ]
+        )
+        session.execute(
+            _insert_query.on_conflict_do_update(
+                index_elements=["organization_name"],
+                set_={
+                    "quantity": OrganizationStatistics.quantity
+                    + _insert_query.excluded.quantity
+                },
+            )
+        )
+        session.execute(
+            text(
+                "DELETE FROM organization_statistics"
+                " WHERE organization_name = ANY(:names) AND quantity <= 0"
+            ),
+            {"names": list(org_stat_deltas)},
+        )
+
+    if type_study_deltas:
+        _insert_query = pg_insert(OrganizationTypeStatistics).values(
+            [
+                {
+                    "organization_type": type_,
+                    "quantity_studies": delta,
+                    "quantity_organizations": type_organization_deltas[type_],
+                }
+                for type_, delta in type_study_deltas.items()
+            ]
+        )
+        session.execute(
+            _insert_query.on_conflict_do_update(
+                index_elements=["organization_type"],
+                set_={
+                    "quantity_studies": OrganizationTypeStatistics.quantity_studies
+                    + _insert_query.excluded.quantity_studies,
+                    "quantity_organizations": OrganizationTypeStatistics.quantity_organizations
+                    + _insert_query.excluded.quantity_organizations,
+                },
+            )
+        )
+        session.execute(
+            text(
+                "DELETE FROM organization_type_statistics"
+                " WHERE organization_type = ANY(:types) AND quantity_studies <= 0"
+            ),
+            {"types": list(type_study_deltas)},
+        )
+
+
+def _reconcile() -> bool:
+    """Rebuild the statistics from the whole table, True if it succeeded."""
+    print("Bulk analytics update STARTED!")
+    main_db_session: Session = next(get_main_db())
+    session: Session = next(get_analysis_db())
+
+    try:
+        # One snapshot for the watermark, the counts and the contributions.
+        main_db_session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        watermark = main_db_session.execute(
+            select(func.coalesce(func.max(Study.updated_at), func.localtimestamp()))
+        ).scalar_one()
+        org_count_rows = _count_studies_per_organization(main_db_session)
+        contributions = main_db_session.execute(
+            select(Study.id, Study.organization_id),
+            execution_options={"stream_results": True, "yield_per": 50000},
+        )
+
+        with session.begin():
+            # Only this service reads the contributions, so they can be truncated.
+            session.execute(text("TRUNCATE study_contributions"))
+            _copy_contributions(session, contributions)
+            _replace_statistics(session, org_count_rows)
+
+            state = session.get(SyncState, SYNC_NAME)
+            if state is None:
+                state = SyncState(name=SYNC_NAME)
+                session.add(state)
+            state.watermark = watermark
+            state.last_full_sync_at = datetime.now()
 
         print("Bulk analytics update SUCCEEDED.")
+        return True
 
     except SQLAlchemyError as e:
         session.rollback()
         print(f"Bulk analytics update FAILED: {e}")
+        return False
+    finally:
+        main_db_session.close()
+        session.close()
+
+
+def _count_studies_per_organization(
+    main_db_session: Session,
+) -> Sequence[Row[tuple[int, str, str, int]]]:
+    # The scan over `studies` groups by the integer key only, names are
+    # joined to the per-organization counts afterwards.
+    studies_per_organization = (
+        select(Study.organization_id, func.count(Study.id).label("quantity"))
+        .where(Study.organization_id.is_not(None))
+        .group_by(Study.organization_id)
+        .subquery()
+    )
+    query = select(
+        Organization.id,
+        Organization.name,
+        Organization.type,
+        studies_per_organization.c.quantity,
+    ).join(
+        studies_per_organization,
+        studies_per_organization.c.organization_id == Organization.id,
+    )
+    return main_db_session.execute(query).all()
+
+
+def _copy_contributions(
+    session: Session, contributions: Iterable[Row[tuple[str, int]]]
+) -> None:
+    cursor = session.connection().connection.cursor()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for count, row in enumerate(contributions, start=1):
+            writer.writerow(row)
+            if count % 50000 == 0:
+                _copy_buffer(cursor, buffer)
+        _copy_buffer(cursor, buffer)
+    finally:
+        cursor.close()
+
+
+def _copy_buffer(cursor: Any, buffer: io.StringIO) -> None:
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY study_contributions (study_id, organization_id)"
+        " FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def _replace_statistics(
+    session: Session, org_count_rows: Sequence[Row[tuple[int, str, str, int]]]
+) -> None:
+    session.execute(text("DELETE FROM organization_counts"))
+    if org_count_rows:
+        session.execute(
+            pg_insert(OrganizationCount).values(
+                [
+                    {
+                        "organization_id": org_id,
+                        "name": name,
+                        "type": type_,
+                        "quantity": quantity,
+                    }
+                    for org_id, name, type_, quantity in org_count_rows
+                ]
+            )
+        )
+
+    # Both statistics are derived from the counts, as the deltas are.
+    session.execute(text("DELETE FROM organization_statistics"))
+    session.execute(
+        text(
+            """
+            INSERT INTO organization_statistics (organization_name, quantity)
+            SELECT name, sum(quantity) FROM organization_counts
+            WHERE name IS NOT NULL
+            GROUP BY name
+            """
+        )
+    )
+    session.execute(text("DELETE FROM organization_type_statistics"))
+    session.execute(
+        text(
+            """
+            INSERT INTO organization_type_statistics
+                (organization_type, quantity_studies, quantity_organizations)
+            SELECT type, sum(quantity), count(name) FROM organization_counts
+            WHERE type IS NOT NULL
+            GROUP BY type
+            """
+        )
+    )
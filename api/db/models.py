@@ -1,19 +1,31 @@
 from datetime import datetime
 
 
-from sqlalchemy import Integer
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import String, DateTime, Boolean
 from db.db import Base
 
 
+class Organization(Base):  # type: ignore[misc]
+    __tablename__ = "organizations"
+    __table_args__ = (
+        UniqueConstraint("name", "type", postgresql_nulls_not_distinct=True),
+        {"extend_existing": True},
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(1024), nullable=True)
+    type: Mapped[str] = mapped_column(String(1024), nullable=True)
+
+
 class Study(Base):  # type: ignore[misc]
     __tablename__ = "studies"
     __table_args__ = {"extend_existing": True}
     id: Mapped[str] = mapped_column(String(1024), primary_key=True)
     title: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_name: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_type: Mapped[str] = mapped_column(String(1024), nullable=True)
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id"), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now
     )
@@ -21,6 +33,16 @@ class Study(Base):  # type: ignore[misc]
         DateTime, nullable=False, default=datetime.now
     )
 
+    organization: Mapped[Organization | None] = relationship(lazy="joined")
+
+    @property
+    def organization_name(self) -> str | None:
+        return self.organization.name if self.organization else None
+
+    @property
+    def organization_type(self) -> str | None:
+        return self.organization.type if self.organization else None
+
 
 class OrganizationStatistics(Base):  # type: ignore[misc]
     __tablename__ = "organization_statistics"
@@ -5,7 +5,7 @@ from datetime import datetime
 import uuid
 
 from db.db import get_db
-from db.models import Study, User
+from db.models import Organization, Study, User
 from dtos.study import StudyCreateDTO, StudyUpdateDTO, StudyResponseDTO
 from utils.security import get_current_active_user, get_current_admin_user
 
@@ -15,6 +15,23 @@ router = APIRouter(
 )
 
 
+def _get_organization(
+    db: Session, name: str | None, organization_type: str | None
+) -> Organization | None:
+    if name is None and organization_type is None:
+        return None
+
+    organization = (
+        db.query(Organization)
+        .filter(Organization.name == name, Organization.type == organization_type)
+        .first()
+    )
+    if organization is None:
+        organization = Organization(name=name, type=organization_type)
+        db.add(organization)
+    return organization
+
+
 @router.post("/", response_model=StudyResponseDTO, status_code=status.HTTP_201_CREATED)  # type: ignore[misc]
 async def create_study(
     study_data: StudyCreateDTO,
@@ -24,8 +41,9 @@ async def create_study(
     new_study = Study(
         id=str(uuid.uuid4()),
         title=study_data.title,
-        organization_name=study_data.organization_name,
-        organization_type=study_data.organization_type,
+        organization=_get_organization(
+            db, study_data.organization_name, study_data.organization_type
+        ),
         created_at=datetime.now(),
         updated_at=datetime.now(),
     )
@@ -52,7 +70,9 @@ async def get_studies(
         query = query.filter(Study.title.ilike(f"%{title}%"))
 
     if organization_name:
-        query = query.filter(Study.organization_name.ilike(f"%{organization_name}%"))
+        query = query.join(Study.organization).filter(
+            Organization.name.ilike(f"%{organization_name}%")
+        )
 
     studies: list[Study] = query.offset(skip).limit(limit).all()
 
@@ -90,6 +110,12 @@ async def update_study(
         )
 
     update_data = study_data.model_dump(exclude_unset=True)
+    if "organization_name" in update_data or "organization_type" in update_data:
+        study.organization = _get_organization(
+            db,
+            update_data.pop("organization_name", study.organization_name),
+            update_data.pop("organization_type", study.organization_type),
+        )
     for key, value in update_data.items():
         setattr(study, key, value)
 
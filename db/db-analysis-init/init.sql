@@ -13,4 +13,22 @@ CREATE TABLE IF NOT EXISTS organization_type_statistics (
     quantity_studies INTEGER NOT NULL,
     quantity_organizations INTEGER NOT NULL,
     PRIMARY KEY (organization_type)
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS organization_counts (
+    organization_id INTEGER PRIMARY KEY,
+    name VARCHAR(1024),
+    type VARCHAR(1024),
+    quantity INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS study_contributions (
+    study_id VARCHAR(1024) PRIMARY KEY,
+    organization_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    name VARCHAR(255) PRIMARY KEY,
+    watermark TIMESTAMP,
+    last_full_sync_at TIMESTAMP
+);
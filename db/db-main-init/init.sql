@@ -2,15 +2,74 @@ CREATE DATABASE main_db;
 
 \c main_db;
 
+CREATE TABLE IF NOT EXISTS organizations (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    UNIQUE NULLS NOT DISTINCT (name, type)
+);
+
 CREATE TABLE IF NOT EXISTS studies (
     id TEXT PRIMARY KEY,
     title TEXT,
-    organization_name TEXT,
-    organization_type TEXT,
+    organization_id INTEGER REFERENCES organizations (id),
+    content_hash TEXT,
     created_at TIMESTAMP NOT NULL,
     updated_at TIMESTAMP NOT NULL
 );
 
+CREATE INDEX IF NOT EXISTS studies_organization_id_idx ON studies (organization_id);
+CREATE INDEX IF NOT EXISTS studies_updated_at_idx ON studies (updated_at);
+
+CREATE OR REPLACE FUNCTION notify_studies_changed() RETURNS trigger AS $$
+BEGIN
+    -- Statements that matched no rows, e.g. an upsert of unchanged studies,
+    -- do not wake the listeners.
+    IF EXISTS (SELECT 1 FROM changed_studies) THEN
+        PERFORM pg_notify('studies_changed', TG_OP);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER studies_inserted
+    AFTER INSERT ON studies
+    REFERENCING NEW TABLE AS changed_studies
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_studies_changed();
+
+CREATE OR REPLACE TRIGGER studies_updated
+    AFTER UPDATE ON studies
+    REFERENCING NEW TABLE AS changed_studies
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_studies_changed();
+
+CREATE TABLE IF NOT EXISTS crawl_state (
+    name VARCHAR(255) PRIMARY KEY,
+    page_token TEXT,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    last_success_at TIMESTAMP,
+    watermark DATE
+);
+
+CREATE TABLE IF NOT EXISTS crawl_queue (
+    name VARCHAR(255) PRIMARY KEY,
+    query TEXT,
+    available_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+    lease_owner VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS search_areas (
+    document VARCHAR(255) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    param VARCHAR(255),
+    ui_label VARCHAR(1024),
+    fields JSON NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (document, name)
+);
+
 CREATE TABLE IF NOT EXISTS users (
     id TEXT PRIMARY KEY,
     username VARCHAR(100) UNIQUE NOT NULL,
@@ -0,0 +1,164 @@
+"""Content-addressed archive of the raw /studies pages the scraper fetched.
+
+Every page body is stored once, gzip compressed, under its SHA-256 digest:
+
+    <root>/objects/ab/abcdef....json.gz
+
+and one line per fetch is appended to `<root>/manifest.ndjson`, in fetch
+order. `reprocess.py` rebuilds `studies` from the archive, so a new field or a
+parser fix can be applied to old data without crawling the registry again.
+That only works for fields the archived pages contain. The scraper archives
+whole pages, without the `fields` projection, and the manifest records the
+projection of every page.
+
+With `max_bytes`, `prune()` drops the least recently fetched pages until the
+objects fit. One scraper process writes to an archive at a time.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Collection, Iterable, Iterator
+
+# Pages archived before whole pages were kept carry the projection the study
+# crawl used at the time.
+LEGACY_FIELDS = (
+    "protocolSection.identificationModule.nctId",
+    "protocolSection.identificationModule.briefTitle",
+    "protocolSection.identificationModule.organization",
+    "protocolSection.statusModule.lastUpdatePostDateStruct",
+)
+
+
+class PageArchive:
+    def __init__(self, root: str, max_bytes: int = 0) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects = os.path.join(root, "objects")
+        self.manifest_path = os.path.join(root, "manifest.ndjson")
+        os.makedirs(self.objects, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], f"{digest}.json.gz")
+
+    def put(
+        self,
+        raw: bytes,
+        crawl_name: str,
+        params: dict[str, Any] | None = None,
+        fields: Collection[str] = (),
+    ) -> str:
+        """Store a page body if it is new and record the fetch in the manifest.
+
+        `params` are the request parameters (page token, filters) and `fields`
+        the projection the page was fetched with, empty for whole pages.
+        Returns the digest of the body. Identical pages, e.g. an unchanged
+        page crawled again, share one object.
+        """
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.object_path(digest)
+        entry = {
+            "digest": digest,
+            "crawl": crawl_name,
+            "params": {k: v for k, v in (params or {}).items() if v is not None},
+            "fields": list(fields),
+            "size": len(raw),
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Written under a temporary name, readers never see a partial object.
+                partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with gzip.open(partial, "wb", compresslevel=6) as file:
+                    file.write(raw)
+                os.replace(partial, path)
+
+            with open(self.manifest_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with gzip.open(self.object_path(digest), "rb") as file:
+            return file.read()
+
+    def manifest(self) -> Iterator[dict[str, Any]]:
+        """Yield the manifest entries in fetch order."""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding="utf-8") as file:
+            for line in file:
+                # A crash can leave the last line incomplete.
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    def latest_entries(self) -> list[dict[str, Any]]:
+        """The last manifest entry of every page, ordered by that fetch."""
+        latest: dict[str, dict[str, Any]] = {}
+        for entry in self.manifest():
+            latest.pop(entry["digest"], None)
+            latest[entry["digest"]] = entry
+        return list(latest.values())
+
+    def latest_digests(self) -> list[str]:
+        """Distinct digests, ordered by the last time each page was fetched."""
+        return [entry["digest"] for entry in self.latest_entries()]
+
+    @staticmethod
+    def missing_fields(
+        entries: Iterable[dict[str, Any]], needed: Collection[str]
+    ) -> tuple[int, set[str]]:
+        """Count the pages whose projection lacks any of the `needed` fields.
+
+        Returns that count and the missing fields.
+        """
+        incomplete = 0
+        missing: set[str] = set()
+        for entry in entries:
+            fields = entry.get("fields", LEGACY_FIELDS)
+            # An empty projection is a whole page.
+            lacking = set(needed) - set(fields) if fields else set()
+            if lacking:
+                incomplete += 1
+                missing |= lacking
+        return incomplete, missing
+
+    def prune(self) -> int:
+        """Drop the least recently fetched pages until the objects fit in `max_bytes`.
+
+        The manifest is rewritten with one line per remaining page. Returns
+        the number of pages removed.
+        """
+        if not self.max_bytes:
+            return 0
+
+        with self._lock:
+            entries = self.latest_entries()
+            sizes = []
+            for entry in entries:
+                try:
+                    sizes.append(os.path.getsize(self.object_path(entry["digest"])))
+                except FileNotFoundError:
+                    sizes.append(0)
+
+            total = sum(sizes)
+            removed = 0
+            while removed < len(entries) and total > self.max_bytes:
+                total -= sizes[removed]
+                try:
+                    os.remove(self.object_path(entries[removed]["digest"]))
+                except FileNotFoundError:
+                    pass
+                removed += 1
+
+            partial = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(partial, "w", encoding="utf-8") as file:
+                for entry in entries[removed:]:
+                    file.write(json.dumps(entry) + "\n")
+            os.replace(partial, self.manifest_path)
+        return removed
@@ -0,0 +1,44 @@
+"""Initial load of the whole registry with partitions crawled in parallel.
+
+    python backfill.py --workers 8 --start-year 2000
+"""
+
+import argparse
+import asyncio
+from datetime import date
+
+from main import setup
+from settings import settings
+from tasks import BackfillStudiesTask
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=settings.backfill_workers)
+    parser.add_argument(
+        "--start-year",
+        type=int,
+        default=2000,
+        help="First yearly partition, older studies are folded into it.",
+    )
+    parser.add_argument("--end-year", type=int, default=date.today().year)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Crawl finished partitions again instead of skipping them.",
+    )
+    args = parser.parse_args()
+
+    setup()
+    asyncio.run(
+        BackfillStudiesTask.run(
+            workers=args.workers,
+            start_year=args.start_year,
+            end_year=args.end_year,
+            restart=args.restart,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare per-page CPU time and peak memory of the /studies page parsers.
+
+Run from the scraper directory, no database or network is needed:
+
+    python -m benchmarks.parse --studies 1000 --pages 20
+
+Each path parses the same synthetic page, shaped like a projected /studies
+response. `--full` adds the unprojected sections as well, which is what a page
+looks like without the `fields` parameter. Peak memory is measured with
+tracemalloc on a separate run, so tracing does not skew the timings.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from data_parser import StudyCollector
+
+
+def _make_page(count: int, full: bool) -> bytes:
+    studies: list[dict[str, Any]] = []
+    for i in range(count):
+        study: dict[str, Any] = {
+            "protocolSection": {
+                "identificationModule": {
+                    "nctId": f"NCT{i:08d}",
+                    "briefTitle": f"Benchmark study {i} with a reasonably long title",
+                    "organization": {
+                        "fullName": f"Benchmark organization {i % 500}",
+                        "class": ("OTHER", "INDUSTRY", "NIH", "FED")[i % 4],
+                    },
+                },
+                "statusModule": {
+                    "lastUpdatePostDateStruct": {"date": "2024-05-17", "type": "ACTUAL"}
+                },
+            }
+        }
+        if full:
+            study["protocolSection"]["descriptionModule"] = {
+                "briefSummary": "Lorem ipsum dolor sit amet. " * 40
+            }
+            study["protocolSection"]["conditionsModule"] = {
+                "conditions": [f"Condition {j}" for j in range(10)],
+                "keywords": [f"Keyword {j}" for j in range(10)],
+            }
+            study["derivedSection"] = {
+                "conditionBrowseModule": {
+                    "meshes": [{"id": f"D{j:06d}", "term": "Term"} for j in range(20)]
+                }
+            }
+        studies.append(study)
+    return json.dumps({"studies": studies, "nextPageToken": "token-2"}).encode()
+
+
+def dto_list(raw: bytes) -> int:
+    studies = StudyCollector.parse_dto_list(json.loads(raw)).studies or []
+    return len(studies)
+
+
+def raw_page(raw: bytes) -> int:
+    return len(StudyCollector.parse_raw_page(raw))
+
+
+def records(raw: bytes) -> int:
+    return len(StudyCollector.parse_records(raw)[0])
+
+
+def _measure(
+    parse: Callable[[bytes], int], raw: bytes, pages: int
+) -> tuple[float, int]:
+    started = time.process_time()
+    for _ in range(pages):
+        parse(raw)
+    cpu = (time.process_time() - started) / pages
+
+    tracemalloc.start()
+    try:
+        parse(raw)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return cpu, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--studies", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--full", action="store_true")
+    args = parser.parse_args()
+
+    raw = _make_page(args.studies, args.full)
+    print(f"page: {args.studies} studies, {len(raw) / 1024:.0f} KiB")
+
+    paths = {"dto_list": dto_list, "raw_page": raw_page, "records": records}
+    for name, parse in paths.items():
+        cpu, peak = _measure(parse, raw, args.pages)
+        print(
+            f"{name:>8}: {cpu * 1000:8.2f} ms/page "
+            f"{args.studies / cpu:10.0f} studies/s, peak {peak / 1024:8.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
-from typing import Any
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Iterator, NamedTuple
+from urllib.parse import urlencode
 
-import requests
-from pydantic import BaseModel, ConfigDict
+import httpx
+import ijson
+from ijson.common import ObjectBuilder
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing_extensions import TypedDict
 from abc import abstractmethod
 
 
@@ -26,6 +39,7 @@ class ClinicalTrialsStudyDTO(ClinicalTrialsDTO):
     id: str
     title: str | None = None
     organization: ClinicalTrialsOrganizationDTO | None = None
+    last_update_date: date | None = None
 
 
 class ClinicalTrialsStudyListDTO(ClinicalTrialsDTO):
@@ -33,36 +47,551 @@ class ClinicalTrialsStudyListDTO(ClinicalTrialsDTO):
     next_page_token: str | None = ""
 
 
+class ClinicalSearchAreaDTO(ClinicalTrialsDTO):
+    document: str
+    name: str
+    param: str | None = None
+    ui_label: str | None = None
+    fields: list[str] = []
+
+
 class ClinicalSearchAreasDTO(ClinicalTrialsDTO):
-    pass
+    areas: list[ClinicalSearchAreaDTO] = []
+
+
+class StudyRecord(NamedTuple):
+    """Compact study produced by the batched parse path, one tuple per study."""
+
+    id: str
+    title: str | None
+    organization_name: str | None
+    organization_type: str | None
+    last_update_date: date | None
+
+
+# Shape of a projected /studies page, validated by pydantic-core in one call.
+# "class" is a keyword, hence the functional TypedDict syntax. pydantic needs
+# typing_extensions.TypedDict below Python 3.12.
+_OrganizationJSON = TypedDict(
+    "_OrganizationJSON", {"fullName": str | None, "class": str | None}, total=False
+)
+
+
+class _IdentificationModuleJSON(TypedDict, total=False):
+    nctId: str | None
+    briefTitle: str | None
+    organization: _OrganizationJSON | None
+
+
+class _DateStructJSON(TypedDict, total=False):
+    date: str | None
+
+
+class _StatusModuleJSON(TypedDict, total=False):
+    lastUpdatePostDateStruct: _DateStructJSON | None
+
+
+class _ProtocolSectionJSON(TypedDict, total=False):
+    identificationModule: _IdentificationModuleJSON | None
+    statusModule: _StatusModuleJSON | None
+
+
+class _StudyJSON(TypedDict, total=False):
+    protocolSection: _ProtocolSectionJSON | None
+
+
+class _StudyPageJSON(TypedDict, total=False):
+    studies: list[_StudyJSON] | None
+    nextPageToken: str | None
+
+
+_STUDY_PAGE_ADAPTER = TypeAdapter(_StudyPageJSON)
+
+
+def _parse_date(value: str | None) -> date | None:
+    """Parse the API's partial ISO dates ("2024-05" or "2024-05-17")."""
+    if not value:
+        return None
+    if len(value) == 7:
+        value = f"{value}-01"
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate backs off on throttling and recovers on success.
+
+    The rate is cut multiplicatively on every 429/503 and grows back additively
+    with each successful response, up to `max_rate`. A Retry-After from the
+    server pauses the whole bucket until that moment.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        burst: int = 1,
+        min_rate: float = 0.05,
+        backoff_factor: float = 0.5,
+        recovery_step: float = 0.05,
+    ) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.burst = burst
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                elapsed = now - self._updated_at
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_step)
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    digest: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def validators(self) -> dict[str, str]:
+        """Headers that turn the next request for this entry into a conditional one."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """On-disk cache of GET responses, revalidated with conditional requests.
+
+    Each entry is a `<key>.body` file plus a `<key>.json` with its validators
+    (ETag, Last-Modified) and body digest, keyed by resource and query
+    parameters. Collectors send the validators back, so unchanged reference
+    data costs a 304 and the caller can skip parsing it again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(resource: str, params: dict[str, Any]) -> str:
+        query = urlencode(sorted((name, str(value)) for name, value in params.items()))
+        return hashlib.sha256(f"{resource}?{query}".encode()).hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        try:
+            with open(self._file(key, "json"), encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(self._file(key, "body"), "rb") as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None
+        if hashlib.sha256(body).hexdigest() != meta.get("digest"):
+            return None
+        return CachedResponse(body, meta["digest"], meta["etag"], meta["last_modified"])
+
+    def put(self, key: str, response: httpx.Response) -> CachedResponse:
+        entry = CachedResponse(
+            response.content,
+            hashlib.sha256(response.content).hexdigest(),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        # The body goes first, a metadata file always describes a complete body.
+        self._write(self._file(key, "body"), entry.body)
+        meta = {
+            "digest": entry.digest,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+        }
+        self._write(self._file(key, "json"), json.dumps(meta).encode())
+        return entry
+
+    def _file(self, key: str, extension: str) -> str:
+        return os.path.join(self.path, f"{key}.{extension}")
+
+    @staticmethod
+    def _write(path: str, content: bytes) -> None:
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "wb") as file:
+            file.write(content)
+        os.replace(partial, path)
 
 
 class ClinicalTrialsCollector:
-    def __init__(self) -> None:
+    # Every collector shares one keep-alive connection pool, so consecutive
+    # pages reuse the same TLS connections instead of opening new ones, and
+    # one rate limiter, so all of them together stay under the API limit.
+    _client: httpx.AsyncClient | None = None
+    _rate_limiter: AdaptiveRateLimiter | None = None
+    _transport: httpx.AsyncBaseTransport | None = None
+    # Conditional-request cache for slow-changing resources, see get_cached_raw_data.
+    _cache: HttpCache | None = None
+
+    max_connections: int = 10
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+    rate_limit: float = 1.0
+    burst: int = 3
+    max_retries: int = 5
+    retry_backoff: float = 1.0
+    max_retry_backoff: float = 120.0
+
+    THROTTLE_STATUSES = frozenset({429, 503})
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    # Response fields the collector reads, sent as the `fields` projection so
+    # the API leaves everything else out of the payload. Empty means all.
+    fields: tuple[str, ...] = ()
+
+    def __init__(self, concurrency: int = 4, project_fields: bool = True) -> None:
         self.base_url = "https://clinicaltrials.gov/api/v2/"
         self.resource = "/version"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Off when whole pages are needed, e.g. to archive them.
+        self.projection = self.fields if project_fields else ()
+
+    @classmethod
+    def configure(
+        cls,
+        rate_limit: float | None = None,
+        max_retries: int | None = None,
+        timeout: float | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        cache: HttpCache | None = None,
+    ) -> None:
+        """Override the shared HTTP settings before the first request is made."""
+        if transport is not None:
+            ClinicalTrialsCollector._transport = transport
+        if cache is not None:
+            ClinicalTrialsCollector._cache = cache
+        if rate_limit is not None:
+            ClinicalTrialsCollector.rate_limit = rate_limit
+        if max_retries is not None:
+            ClinicalTrialsCollector.max_retries = max_retries
+        if timeout is not None:
+            ClinicalTrialsCollector.timeout = timeout
+
+    def get_client(self) -> httpx.AsyncClient:
+        client = ClinicalTrialsCollector._client
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=ClinicalTrialsCollector._transport,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            ClinicalTrialsCollector._client = client
+        return client
+
+    def get_rate_limiter(self) -> AdaptiveRateLimiter:
+        if ClinicalTrialsCollector._rate_limiter is None:
+            ClinicalTrialsCollector._rate_limiter = AdaptiveRateLimiter(
+                max_rate=self.rate_limit, burst=self.burst
+            )
+        return ClinicalTrialsCollector._rate_limiter
+
+    @classmethod
+    async def close(cls) -> None:
+        client = ClinicalTrialsCollector._client
+        ClinicalTrialsCollector._client = None
+        ClinicalTrialsCollector._rate_limiter = None
+        if client is not None:
+            await client.aclose()
+
+    def _params(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        params = {key: value for key, value in kwargs.items() if value is not None}
+        if self.projection:
+            params.setdefault("fields", ",".join(self.projection))
+        return params
 
-    def get_json_data(self, **kwargs: Any) -> dict[str, Any] | Any:
-        response = requests.get(self.base_url + f"/{self.resource}", params=kwargs)
-        return response.json()
+    async def get_json_data(self, **kwargs: Any) -> dict[str, Any] | Any:
+        params = self._params(kwargs)
+        json_data, size, decode_time = await self._fetch(params)
+        print(
+            f"{self.resource}: {size / 1024:.1f} KiB decoded in "
+            f"{decode_time * 1000:.1f} ms ({len(self.projection) or 'all'} fields)"
+        )
+        return json_data
+
+    async def log_projection_savings(self, **kwargs: Any) -> None:
+        """Fetch one request with and without the field projection and log both."""
+        if not self.fields:
+            return
+        params = {key: value for key, value in kwargs.items() if value is not None}
+        _, full_size, full_time = await self._fetch(params)
+        _, size, decode_time = await self._fetch(
+            {**params, "fields": ",".join(self.fields)}
+        )
+        print(
+            f"{self.resource}: field projection shrinks the response from "
+            f"{full_size / 1024:.1f} to {size / 1024:.1f} KiB "
+            f"({full_size / max(size, 1):.1f}x) and decode time from "
+            f"{full_time * 1000:.1f} to {decode_time * 1000:.1f} ms"
+        )
+
+    @asynccontextmanager
+    async def stream_response(self, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """Open a request whose body is read incrementally by the caller."""
+        params = self._params(kwargs)
+        async with self._semaphore:
+            response = await self._send(params, stream=True)
+            try:
+                yield response
+            finally:
+                await response.aclose()
+
+    async def get_raw_data(self, **kwargs: Any) -> bytes:
+        """Fetch a response body without decoding it."""
+        params = self._params(kwargs)
+        async with self._semaphore:
+            response = await self._send(params)
+        return response.content
+
+    async def get_cached_raw_data(self, **kwargs: Any) -> tuple[bytes, bool]:
+        """Fetch a response body through the HTTP cache.
+
+        A cached entry is revalidated with If-None-Match/If-Modified-Since.
+        Returns the body and whether it changed since the cached copy, so
+        callers can skip parsing unchanged data. Without a cache, every body
+        counts as changed.
+        """
+        params = self._params(kwargs)
+        cache = ClinicalTrialsCollector._cache
+        if cache is None:
+            async with self._semaphore:
+                response = await self._send(params)
+            return response.content, True
+
+        key = cache.key(self.resource, params)
+        cached = cache.get(key)
+        async with self._semaphore:
+            response = await self._send(
+                params, headers=cached.validators() if cached else None
+            )
+
+        if cached is not None and response.status_code == httpx.codes.NOT_MODIFIED:
+            print(f"{self.resource}: not modified, using the cached response")
+            return cached.body, False
+        entry = cache.put(key, response)
+        # Servers without validators still send the same bytes for unchanged data.
+        return entry.body, cached is None or cached.digest != entry.digest
+
+    async def _fetch(self, params: dict[str, Any]) -> tuple[Any, int, float]:
+        async with self._semaphore:
+            response = await self._send(params)
+
+        started = time.perf_counter()
+        json_data = response.json()
+        return json_data, len(response.content), time.perf_counter() - started
+
+    async def _send(
+        self,
+        params: dict[str, Any],
+        stream: bool = False,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """Send a GET through the rate limiter, retrying throttling and 5xx.
+
+        A 304 to a conditional request is returned like a success.
+        """
+        client = self.get_client()
+        rate_limiter = self.get_rate_limiter()
+        attempt = 0
+
+        while True:
+            await rate_limiter.acquire()
+            try:
+                response = await client.send(
+                    client.build_request(
+                        "GET", self.resource, params=params, headers=headers
+                    ),
+                    stream=stream,
+                )
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+                print(f"{self.resource}: {e!r}, retry in {delay:.1f}s")
+            else:
+                if (
+                    response.is_success
+                    or response.status_code == httpx.codes.NOT_MODIFIED
+                ):
+                    rate_limiter.on_success()
+                    return response
+                if (
+                    response.status_code not in self.RETRY_STATUSES
+                    or attempt >= self.max_retries
+                ):
+                    await response.aclose()
+                    response.raise_for_status()
+
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code in self.THROTTLE_STATUSES:
+                    rate_limiter.on_throttle(retry_after)
+                await response.aclose()
+                delay = max(self._retry_delay(attempt), retry_after or 0.0)
+                print(
+                    f"{self.resource}: HTTP {response.status_code}, "
+                    f"retry in {delay:.1f}s (rate {rate_limiter.rate:.2f}/s)"
+                )
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int) -> float:
+        # Exponential backoff with full jitter.
+        cap = min(self.max_retry_backoff, self.retry_backoff * 2**attempt)
+        return random.uniform(0, cap)
 
     @abstractmethod
-    def get_dto_list(self, **kwargs: Any) -> list[BaseModel]: ...
+    async def get_dto_list(self, **kwargs: Any) -> list[BaseModel]: ...
 
 
 class StudyCollector(ClinicalTrialsCollector):
-    def __init__(self) -> None:
-        super().__init__()
+    fields = (
+        "protocolSection.identificationModule.nctId",
+        "protocolSection.identificationModule.briefTitle",
+        "protocolSection.identificationModule.organization",
+        "protocolSection.statusModule.lastUpdatePostDateStruct",
+    )
+
+    def __init__(self, concurrency: int = 4, project_fields: bool = True) -> None:
+        super().__init__(concurrency=concurrency, project_fields=project_fields)
         self.resource = "/studies"
 
-    def get_total_count(self) -> int | Any:
-        url = self.base_url + f"/{self.resource}?countTotal=true"
-        response = requests.get(url)
-        json_data = response.json()
-        return json_data.get("totalCount")
+    async def get_dto_list(
+        self, **kwargs: dict[str, Any]
+    ) -> ClinicalTrialsStudyListDTO:
+        json_data = await self.get_json_data(**kwargs)
+        return self.parse_dto_list(json_data)
+
+    def stream_dto_list(self, **kwargs: Any) -> "StudyStream":
+        """Parse a page study by study while its body is still arriving."""
+        return StudyStream(self, kwargs)
+
+    @staticmethod
+    def updated_since_params(since: date) -> dict[str, Any]:
+        """Query parameters selecting studies last updated on or after `since`."""
+        # The API only takes dates, a datetime would be sent with its time.
+        if isinstance(since, datetime):
+            since = since.date()
+        return {
+            "filter.advanced": f"AREA[LastUpdatePostDate]RANGE[{since.isoformat()},MAX]",
+            "sort": "LastUpdatePostDate:asc",
+        }
+
+    @staticmethod
+    def find_next_page_token(raw: bytes) -> str | None:
+        """Read nextPageToken from a raw page without decoding the whole page.
+
+        The API writes the token as the last top-level key, so only the tail
+        of the body is looked at. Occurrences inside study text are escaped.
+        """
+        key = b'"nextPageToken"'
+        position = raw.rfind(key)
+        if position <= 0 or raw.endswith(b"\\", 0, position):
+            return None
+        tail = raw[position:].decode()
+        start = tail.index(":", len(key)) + 1
+        while tail[start].isspace():
+            start += 1
+        token, _ = json.JSONDecoder().raw_decode(tail, start)
+        return token if isinstance(token, str) and token else None
+
+    @staticmethod
+    def parse_records(raw: bytes) -> tuple[list[StudyRecord], str | None]:
+        """Decode and validate a whole page in one pydantic-core call.
 
-    def get_dto_list(self, **kwargs: dict[str, Any]) -> ClinicalTrialsStudyListDTO:
-        json_data = self.get_json_data(**kwargs)
+        Only the projected keys are materialized and each study becomes a
+        single StudyRecord tuple, no per-study pydantic models are built.
+        Returns the records and the next page token.
+        """
+        page = _STUDY_PAGE_ADAPTER.validate_json(raw)
+        records = []
+        for study in page.get("studies") or ():
+            protocol_section = study.get("protocolSection")
+            if not protocol_section:
+                continue
+            identification = protocol_section.get("identificationModule") or {}
+            study_id = identification.get("nctId")
+            if not study_id:
+                continue
+            organization = identification.get("organization") or {}
+            status_module = protocol_section.get("statusModule") or {}
+            last_update = status_module.get("lastUpdatePostDateStruct") or {}
+            records.append(
+                StudyRecord(
+                    study_id,
+                    identification.get("briefTitle"),
+                    organization.get("fullName"),
+                    organization.get("class"),
+                    _parse_date(last_update.get("date")),
+                )
+            )
+        return records, page.get("nextPageToken") or None
+
+    @staticmethod
+    def parse_raw_page(raw: bytes) -> list[ClinicalTrialsStudyDTO]:
+        dto_list = []
+        for study in ijson.items(raw, "studies.item"):
+            _dto = StudyCollector.parse_study(study)
+            if _dto is not None:
+                dto_list.append(_dto)
+        return dto_list
+
+    @staticmethod
+    def parse_dto_list(json_data: dict[str, Any]) -> ClinicalTrialsStudyListDTO:
         studies = json_data.get("studies")
         next_page_token = json_data.get("nextPageToken")
         dto_list: list[ClinicalTrialsStudyDTO] = []
@@ -71,33 +600,130 @@ class StudyCollector(ClinicalTrialsCollector):
             return ClinicalTrialsStudyListDTO(studies=dto_list, next_page_token="")
 
         for study in studies:
-            protocol_section = study.get("protocolSection")
-            if protocol_section is None:
-                continue
+            _dto = StudyCollector.parse_study(study)
+            if _dto is not None:
+                dto_list.append(_dto)
 
-            identification_module_item = protocol_section.get("identificationModule")
-            organization = identification_module_item.get("organization")
-            organization_dto = None
+        return ClinicalTrialsStudyListDTO(
+            studies=dto_list, next_page_token=next_page_token
+        )
 
-            if organization is not None:
-                organization_dto = ClinicalTrialsOrganizationDTO(
-                    name=organization.get("fullName"), type=organization.get("class")
-                )
+    @staticmethod
+    def parse_study(study: dict[str, Any]) -> ClinicalTrialsStudyDTO | None:
+        protocol_section = study.get("protocolSection")
+        if protocol_section is None:
+            return None
+
+        identification_module_item = protocol_section.get("identificationModule")
+        organization = identification_module_item.get("organization")
+        organization_dto = None
 
-            _dto = ClinicalTrialsStudyDTO(
-                id=identification_module_item.get("nctId"),
-                title=identification_module_item.get("briefTitle"),
-                organization=organization_dto,
+        if organization is not None:
+            organization_dto = ClinicalTrialsOrganizationDTO(
+                name=organization.get("fullName"), type=organization.get("class")
             )
 
-            dto_list.append(_dto)
+        status_module = protocol_section.get("statusModule") or {}
+        last_update = status_module.get("lastUpdatePostDateStruct") or {}
 
-        return ClinicalTrialsStudyListDTO(
-            studies=dto_list, next_page_token=next_page_token
+        return ClinicalTrialsStudyDTO(
+            id=identification_module_item.get("nctId"),
+            title=identification_module_item.get("briefTitle"),
+            organization=organization_dto,
+            last_update_date=_parse_date(last_update.get("date")),
+        )
+
+
+class StudyStream:
+    """One /studies page parsed incrementally with ijson.
+
+    `async for` yields the studies one at a time as their JSON arrives, so
+    neither the whole body nor the decoded document is held in memory.
+    `next_page_token` is set once the page has been consumed.
+    """
+
+    def __init__(self, collector: StudyCollector, params: dict[str, Any]) -> None:
+        self.collector = collector
+        self.params = params
+        self.next_page_token: str | None = None
+        self._builder: ObjectBuilder | None = None
+
+    async def __aiter__(self) -> AsyncIterator[ClinicalTrialsStudyDTO]:
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events)
+        size = 0
+        started = time.perf_counter()
+
+        async with self.collector.stream_response(**self.params) as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                parser.send(chunk)
+                for _dto in self._consume(events):
+                    yield _dto
+        parser.close()
+        for _dto in self._consume(events):
+            yield _dto
+
+        print(
+            f"{self.collector.resource}: {size / 1024:.1f} KiB streamed in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
         )
 
+    def _consume(self, events: list[Any]) -> Iterator[ClinicalTrialsStudyDTO]:
+        for prefix, event, value in events:
+            if self._builder is not None:
+                self._builder.event(event, value)
+                if prefix == "studies.item" and event == "end_map":
+                    _dto = StudyCollector.parse_study(self._builder.value)
+                    self._builder = None
+                    if _dto is not None:
+                        yield _dto
+            elif prefix == "studies.item" and event == "start_map":
+                self._builder = ObjectBuilder()
+                self._builder.event(event, value)
+            elif prefix == "nextPageToken" and event == "string":
+                self.next_page_token = value
+        del events[:]
+
 
 class StudySearchAreasCollector(ClinicalTrialsCollector):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, concurrency: int = 4) -> None:
+        super().__init__(concurrency=concurrency)
         self.resource = "/studies/search-areas"
+
+    async def get_dto_list(
+        self, changed_only: bool = False, **kwargs: Any
+    ) -> ClinicalSearchAreasDTO | None:
+        """Fetch the search-areas taxonomy.
+
+        The request goes through the HTTP cache. With `changed_only`, an
+        unchanged taxonomy costs a 304, is not parsed again and gives None.
+        """
+        raw, changed = await self.get_cached_raw_data(**kwargs)
+        if changed_only and not changed:
+            return None
+        return self.parse_dto_list(json.loads(raw))
+
+    @staticmethod
+    def parse_dto_list(json_data: list[dict[str, Any]] | Any) -> ClinicalSearchAreasDTO:
+        """Flatten the search documents into one DTO per (document, area)."""
+        areas = []
+        for document in json_data or []:
+            for area in document.get("areas") or []:
+                fields: list[str] = []
+                for part in area.get("parts") or []:
+                    fields.extend(
+                        field
+                        for field in part.get("fields") or []
+                        if field not in fields
+                    )
+                areas.append(
+                    ClinicalSearchAreaDTO(
+                        document=document.get("name"),
+                        name=area.get("name"),
+                        param=area.get("param"),
+                        ui_label=area.get("uiLabel"),
+                        fields=fields,
+                    )
+                )
+        return ClinicalSearchAreasDTO(areas=areas)
@@ -0,0 +1,167 @@
+import hashlib
+import io
+import threading
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from .index import KnownStudyIndex
+
+StudyRow = tuple[str, str | None, str | None, str | None]
+OrganizationKey = tuple[str | None, str | None]
+
+_STAGING_TABLE = "studies_staging"
+_COLUMNS = "id, title, organization_id, content_hash"
+
+# COPY text format: tab separated, \N for NULL, backslash escapes.
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value: str | int | None) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, int):
+        return str(value)
+    return value.translate(_COPY_ESCAPES)
+
+
+def study_content_hash(
+    title: str | None, organization_name: str | None, organization_type: str | None
+) -> str:
+    """Hash of the stored fields, insensitive to whitespace-only differences."""
+    normalized = "\x1f".join(
+        " ".join(value.split()) if value is not None else "\x00"
+        for value in (title, organization_name, organization_type)
+    )
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class OrganizationCache:
+    """Maps (name, type) to `organizations.id`, shared by the writers of a process.
+
+    Unknown organizations are inserted in a short transaction of their own and
+    committed before the studies that reference them, so a cached id always
+    exists even when the caller's transaction is rolled back.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[OrganizationKey, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def resolve(
+        self, session: Session, keys: Iterable[OrganizationKey]
+    ) -> dict[OrganizationKey, int]:
+        missing = {key for key in keys if key not in self._ids and key != (None, None)}
+        if missing:
+            # A stable order keeps concurrent writers from deadlocking.
+            ordered = sorted(missing, key=lambda key: (key[0] or "", key[1] or ""))
+            with session.get_bind().begin() as connection:
+                # DO UPDATE instead of DO NOTHING, so existing rows return ids too.
+                rows = connection.exec_driver_sql(
+                    """
+                    INSERT INTO organizations (name, type)
+                    SELECT * FROM unnest(%s::text[], %s::text[])
+                    ON CONFLICT (name, type) DO UPDATE SET name = EXCLUDED.name
+                    RETURNING id, name, type
+                    """,
+                    ([key[0] for key in ordered], [key[1] for key in ordered]),
+                ).all()
+            with self._lock:
+                for organization_id, name, type_ in rows:
+                    self._ids[(name, type_)] = organization_id
+        return self._ids
+
+
+class StudyBulkWriter:
+    """Load study rows with COPY into a staging table and merge them into `studies`.
+
+    Runs on the session's own connection, so the merge is part of the caller's
+    transaction. The staging table is temporary and emptied on every commit.
+
+    With a KnownStudyIndex, rows whose content hash matches the index are not
+    sent at all. Call `commit_index()` once the transaction is committed.
+    Organization names are turned into ids through the shared `organizations`
+    cache, only the integer key is stored on the study.
+    """
+
+    organizations = OrganizationCache()
+
+    def __init__(self, session: Session, index: KnownStudyIndex | None = None) -> None:
+        self.session = session
+        self.index = index
+        self.skipped = 0
+        self.written: list[tuple[str, str]] = []
+
+    def upsert(self, rows: Iterable[StudyRow]) -> int:
+        """Insert new rows and update rows whose content hash changed.
+
+        Unchanged rows are not written at all, so `updated_at` only moves for
+        real changes. Returns the number of inserted plus updated rows.
+        """
+        # Rows may carry extra trailing fields (StudyRecord), only the stored
+        # columns are copied. The last row of an id wins.
+        latest = {row[0]: (row[0], row[1], row[2], row[3]) for row in rows}
+        pending = []
+        for values in latest.values():
+            content_hash = study_content_hash(*values[1:])
+            if self.index is not None:
+                if self.index.is_unchanged(values[0], content_hash):
+                    self.skipped += 1
+                    continue
+                self.written.append((values[0], content_hash))
+            pending.append((values, content_hash))
+        if not pending:
+            return 0
+
+        organization_ids = self.organizations.resolve(
+            self.session, ((values[2], values[3]) for values, _ in pending)
+        )
+        buffer = io.StringIO()
+        for (study_id, title, name, type_), content_hash in pending:
+            organization_id = organization_ids.get((name, type_))
+            values = (study_id, title, organization_id, content_hash)
+            buffer.write("\t".join(map(_copy_value, values)))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                f"""
+                CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} (
+                    id TEXT,
+                    title TEXT,
+                    organization_id INTEGER,
+                    content_hash TEXT
+                ) ON COMMIT DELETE ROWS
+                """
+            )
+            cursor.execute(f"TRUNCATE {_STAGING_TABLE}")
+            cursor.copy_expert(f"COPY {_STAGING_TABLE} ({_COLUMNS}) FROM STDIN", buffer)
+            # DISTINCT ON keeps ON CONFLICT from touching one row twice.
+            cursor.execute(
+                f"""
+                INSERT INTO studies ({_COLUMNS}, created_at, updated_at)
+                SELECT DISTINCT ON (id) {_COLUMNS}, LOCALTIMESTAMP, LOCALTIMESTAMP
+                FROM {_STAGING_TABLE}
+                ORDER BY id
+                ON CONFLICT (id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    organization_id = EXCLUDED.organization_id,
+                    content_hash = EXCLUDED.content_hash,
+                    updated_at = EXCLUDED.updated_at
+                WHERE studies.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                """
+            )
+            return int(cursor.rowcount)
+        finally:
+            cursor.close()
+
+    def commit_index(self) -> None:
+        """Apply the hashes of the written rows to the index."""
+        if self.index is not None:
+            self.index.update(self.written)
+        self.written = []
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+_NCT_PREFIX = "NCT"
+# Keys of ids that are not NCT numbers live above every NCT number.
+_HASHED_KEY = 1 << 63
+
+
+def study_key(study_id: str) -> int:
+    """64-bit key of a study id, exact for NCT ids ("NCT01234567" -> 1234567)."""
+    digits = study_id.removeprefix(_NCT_PREFIX)
+    if study_id.startswith(_NCT_PREFIX) and digits.isdigit() and len(digits) < 18:
+        return int(digits)
+    digest = hashlib.blake2b(study_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") | _HASHED_KEY
+
+
+def hash_key(content_hash: str) -> int:
+    """First 64 bits of a study content hash."""
+    return int(content_hash[:16], 16)
+
+
+class KnownStudyIndex:
+    """Compact in-memory map of stored study ids to their content hash.
+
+    Two parallel sorted arrays of 64-bit integers (about 16 bytes per study)
+    hold the ids and content hashes loaded from `studies`. Ids written later
+    go to a small dict that is merged into the arrays once it grows. A study
+    whose hash matches the index is unchanged and needs no database write.
+    """
+
+    def __init__(self, merge_threshold: int = 50000) -> None:
+        self.merge_threshold = merge_threshold
+        # Sorted keys and their hashes, swapped together as one tuple.
+        self._arrays = (array("Q"), array("Q"))
+        self._recent: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._arrays[0]) + len(self._recent)
+
+    def load(self, session: Session) -> "KnownStudyIndex":
+        """Replace the index with the ids and hashes currently in `studies`."""
+        result = session.execute(
+            text("SELECT id, content_hash FROM studies WHERE content_hash IS NOT NULL"),
+            execution_options={"stream_results": True, "yield_per": 10000},
+        )
+        pairs = sorted(
+            (study_key(study_id), hash_key(content_hash))
+            for study_id, content_hash in result
+        )
+        arrays = _to_arrays(pairs)
+        with self._lock:
+            self._arrays, self._recent = arrays, {}
+        return self
+
+    def is_unchanged(self, study_id: str, content_hash: str) -> bool:
+        key = study_key(study_id)
+        value = self._recent.get(key)
+        if value is None:
+            keys, hashes = self._arrays
+            position = bisect_left(keys, key)
+            if position == len(keys) or keys[position] != key:
+                return False
+            value = hashes[position]
+        return value == hash_key(content_hash)
+
+    def update(self, studies: Iterable[tuple[str, str]]) -> None:
+        """Record (id, content hash) pairs that were committed to `studies`."""
+        with self._lock:
+            keys, hashes = self._arrays
+            for study_id, content_hash in studies:
+                key = study_key(study_id)
+                position = bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    hashes[position] = hash_key(content_hash)
+                else:
+                    self._recent[key] = hash_key(content_hash)
+            if len(self._recent) >= self.merge_threshold:
+                self._merge()
+
+    def _merge(self) -> None:
+        pairs = sorted([*zip(*self._arrays), *self._recent.items()])
+        # The merged arrays are in place before the recent ids are dropped.
+        self._arrays = _to_arrays(pairs)
+        self._recent = {}
+
+
+def _to_arrays(pairs: list[tuple[int, int]]) -> tuple["array[int]", "array[int]"]:
+    return array("Q", (key for key, _ in pairs)), array("Q", (h for _, h in pairs))
@@ -1,18 +1,65 @@
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.types import String, DateTime
+from sqlalchemy.types import JSON, String, Date, DateTime, Integer, Text
 from db.db import Base
 
 
+class Organization(Base):  # type: ignore[misc]
+    __tablename__ = "organizations"
+    __table_args__ = (
+        UniqueConstraint("name", "type", postgresql_nulls_not_distinct=True),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(1024), nullable=True)
+    type: Mapped[str] = mapped_column(String(1024), nullable=True)
+
+
 class Study(Base):  # type: ignore[misc]
     __tablename__ = "studies"
     id: Mapped[str] = mapped_column(String(1024), primary_key=True)
     title: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_name: Mapped[str] = mapped_column(String(1024), nullable=True)
-    organization_type: Mapped[str] = mapped_column(String(1024), nullable=True)
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id"), nullable=True
+    )
+    content_hash: Mapped[str] = mapped_column(String(32), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now
     )
+
+
+class CrawlState(Base):  # type: ignore[misc]
+    __tablename__ = "crawl_state"
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    page_token: Mapped[str] = mapped_column(Text, nullable=True)
+    page_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_success_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    watermark: Mapped[date] = mapped_column(Date, nullable=True)
+
+
+class CrawlUnit(Base):  # type: ignore[misc]
+    __tablename__ = "crawl_queue"
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    query: Mapped[str] = mapped_column(Text, nullable=True)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    lease_owner: Mapped[str] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+class SearchArea(Base):  # type: ignore[misc]
+    __tablename__ = "search_areas"
+    document: Mapped[str] = mapped_column(String(255), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    param: Mapped[str] = mapped_column(String(255), nullable=True)
+    ui_label: Mapped[str] = mapped_column(String(1024), nullable=True)
+    fields: Mapped[list[str]] = mapped_column(JSON, nullable=False, default=list)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
@@ -0,0 +1,147 @@
+import os
+import socket
+import uuid
+from typing import Collection, Iterable, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+class LeaseLost(Exception):
+    """The lease on a crawl unit expired and another instance may hold it."""
+
+
+class ClaimedUnit(NamedTuple):
+    name: str
+    query: str | None
+
+
+class WorkQueue:
+    """Crawl units shared by all scraper instances through `crawl_queue`.
+
+    Instances claim units with SELECT ... FOR UPDATE SKIP LOCKED, so two of
+    them never get the same unit. A claim is a lease the holder renews with
+    heartbeats. When an instance dies its lease expires and another one claims
+    the unit, resuming from the unit's crawl_state checkpoint. All times come
+    from the database clock.
+
+    Methods run on the caller's session and leave committing to the caller.
+    """
+
+    def __init__(self, lease_seconds: int = 300, owner: str | None = None) -> None:
+        self.lease_seconds = lease_seconds
+        self.owner = (
+            owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+
+    def enqueue(
+        self,
+        session: Session,
+        units: Iterable[tuple[str, str | None]],
+        finished: Collection[str] = (),
+        restart: bool = False,
+    ) -> None:
+        """Add (name, query) units that are not queued yet.
+
+        Units named in `finished` are added as already done. With `restart`,
+        queued units are made available again even if they were finished.
+        """
+        conflict = (
+            "DO UPDATE SET query = EXCLUDED.query, finished_at = NULL,"
+            " available_at = LOCALTIMESTAMP"
+            if restart
+            else "DO NOTHING"
+        )
+        for name, query in units:
+            session.execute(
+                text(
+                    f"""
+                    INSERT INTO crawl_queue (name, query, available_at, attempts, finished_at)
+                    VALUES (
+                        :name, :query, LOCALTIMESTAMP, 0,
+                        CASE WHEN :finished THEN LOCALTIMESTAMP END
+                    )
+                    ON CONFLICT (name) {conflict}
+                    """
+                ),
+                {"name": name, "query": query, "finished": name in finished},
+            )
+
+    def claim(self, session: Session, names: Collection[str]) -> ClaimedUnit | None:
+        """Lease one available unit among `names`, None if all are taken or done."""
+        row = session.execute(
+            text(
+                """
+                UPDATE crawl_queue SET
+                    lease_owner = :owner,
+                    lease_expires_at = LOCALTIMESTAMP + make_interval(secs => :lease),
+                    attempts = attempts + 1
+                WHERE name = (
+                    SELECT name FROM crawl_queue
+                    WHERE name = ANY(:names)
+                    AND finished_at IS NULL
+                    AND available_at <= LOCALTIMESTAMP
+                    AND (lease_expires_at IS NULL OR lease_expires_at < LOCALTIMESTAMP)
+                    ORDER BY available_at, name
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING name, query
+                """
+            ),
+            {"owner": self.owner, "lease": self.lease_seconds, "names": list(names)},
+        ).first()
+        return ClaimedUnit(row.name, row.query) if row is not None else None
+
+    def heartbeat(self, session: Session, name: str) -> bool:
+        """Extend the lease on `name`, False if this instance no longer holds it."""
+        result = session.execute(
+            text(
+                """
+                UPDATE crawl_queue
+                SET lease_expires_at = LOCALTIMESTAMP + make_interval(secs => :lease)
+                WHERE name = :name AND lease_owner = :owner
+                AND lease_expires_at >= LOCALTIMESTAMP
+                """
+            ),
+            {"owner": self.owner, "lease": self.lease_seconds, "name": name},
+        )
+        return bool(result.rowcount)
+
+    def release(
+        self,
+        session: Session,
+        name: str,
+        finished: bool = False,
+        available_in: float = 0,
+    ) -> None:
+        """Give up the lease, marking the unit done or due again in `available_in` s."""
+        session.execute(
+            text(
+                """
+                UPDATE crawl_queue SET
+                    lease_owner = NULL,
+                    lease_expires_at = NULL,
+                    available_at = LOCALTIMESTAMP + make_interval(secs => :available_in),
+                    finished_at = CASE WHEN :finished THEN LOCALTIMESTAMP END
+                WHERE name = :name AND lease_owner = :owner
+                """
+            ),
+            {
+                "owner": self.owner,
+                "name": name,
+                "finished": finished,
+                "available_in": available_in,
+            },
+        )
+
+    def unfinished(self, session: Session, names: Collection[str]) -> int:
+        """Number of units among `names` that are not done yet."""
+        count = session.execute(
+            text(
+                "SELECT count(*) FROM crawl_queue"
+                " WHERE name = ANY(:names) AND finished_at IS NULL"
+            ),
+            {"names": list(names)},
+        ).scalar_one()
+        return int(count)
@@ -1,10 +1,154 @@
 import asyncio
-from tasks import CollectStudiesTask
+import httpx
+from sqlalchemy import text
+from data_parser import ClinicalTrialsCollector, HttpCache
+from replay import RecordingTransport, ReplayTransport
+from scheduler import Job, JobRun, Scheduler
+from settings import settings
+from tasks import CollectSearchAreasTask, CollectStudiesTask, DeltaSyncStudiesTask
+from db.db import Base, engine
+import db.models  # noqa: F401
+
+# Columns added after the first deploy are not covered by init.sql.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE studies ADD COLUMN IF NOT EXISTS content_hash TEXT",
+    "ALTER TABLE studies ADD COLUMN IF NOT EXISTS organization_id INTEGER"
+    " REFERENCES organizations (id)",
+    # Move the repeated organization strings into the organizations table.
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'studies' AND column_name = 'organization_name'
+        ) THEN
+            INSERT INTO organizations (name, type)
+            SELECT DISTINCT organization_name, organization_type FROM studies
+            WHERE organization_name IS NOT NULL OR organization_type IS NOT NULL
+            ON CONFLICT DO NOTHING;
+
+            UPDATE studies SET organization_id = organizations.id
+            FROM organizations
+            WHERE organizations.name IS NOT DISTINCT FROM studies.organization_name
+            AND organizations.type IS NOT DISTINCT FROM studies.organization_type
+            AND (studies.organization_name IS NOT NULL
+                 OR studies.organization_type IS NOT NULL);
+
+            ALTER TABLE studies
+                DROP COLUMN organization_name,
+                DROP COLUMN organization_type;
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS studies_organization_id_idx"
+    " ON studies (organization_id)",
+    # The analysis service reads the studies changed since its watermark.
+    "CREATE INDEX IF NOT EXISTS studies_updated_at_idx ON studies (updated_at)",
+    # Wakes the analysis service when studies were inserted or changed.
+    """
+    CREATE OR REPLACE FUNCTION notify_studies_changed() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_studies) THEN
+            PERFORM pg_notify('studies_changed', TG_OP);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "CREATE OR REPLACE TRIGGER studies_inserted AFTER INSERT ON studies"
+    " REFERENCING NEW TABLE AS changed_studies"
+    " FOR EACH STATEMENT EXECUTE FUNCTION notify_studies_changed()",
+    "CREATE OR REPLACE TRIGGER studies_updated AFTER UPDATE ON studies"
+    " REFERENCING NEW TABLE AS changed_studies"
+    " FOR EACH STATEMENT EXECUTE FUNCTION notify_studies_changed()",
+]
+
+
+# Key of the advisory lock that serializes schema upgrades across replicas.
+SCHEMA_LOCK_KEY = 7301
+
+
+def init_schema() -> None:
+    with engine.begin() as connection:
+        # Held until commit, replicas starting together upgrade one at a time.
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY}
+        )
+        Base.metadata.create_all(bind=connection)
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+
+
+def get_transport() -> httpx.AsyncBaseTransport | None:
+    if settings.http_replay_path:
+        print(f"Replaying API responses from {settings.http_replay_path}")
+        return ReplayTransport(
+            settings.http_replay_path,
+            latency=settings.replay_latency,
+            error_rate=settings.replay_error_rate,
+        )
+    if settings.http_record_path:
+        print(f"Recording API responses to {settings.http_record_path}")
+        return RecordingTransport(settings.http_record_path)
+    return None
+
+
+def setup() -> None:
+    init_schema()
+    ClinicalTrialsCollector.configure(
+        rate_limit=settings.requests_per_second,
+        max_retries=settings.max_retries,
+        timeout=settings.request_timeout,
+        transport=get_transport(),
+        cache=HttpCache(settings.http_cache_path),
+    )
+
+
+def get_jobs() -> list[Job]:
+    def job(name: str, run: JobRun, interval: int, timeout: int) -> Job:
+        return Job(
+            name,
+            run,
+            interval=interval,
+            jitter=settings.schedule_jitter,
+            timeout=timeout or None,
+            backoff=settings.job_backoff,
+            max_backoff=settings.job_max_backoff,
+        )
+
+    return [
+        job(
+            "studies",
+            CollectStudiesTask.run_once,
+            settings.crawl_interval,
+            settings.crawl_timeout,
+        ),
+        job(
+            "studies_delta",
+            DeltaSyncStudiesTask.run_once,
+            settings.delta_sync_interval,
+            settings.delta_sync_timeout,
+        ),
+        job(
+            "search_areas",
+            CollectSearchAreasTask.run_once,
+            settings.search_areas_interval,
+            settings.search_areas_timeout,
+        ),
+    ]
 
 
 async def main() -> None:
     print("Scraper service was started!")
-    await asyncio.gather(CollectStudiesTask.collect())
+    setup()
+    await CollectStudiesTask.setup()
+    scheduler = Scheduler(
+        get_jobs(), report_interval=settings.scheduler_report_interval
+    )
+    try:
+        await scheduler.run()
+    finally:
+        await ClinicalTrialsCollector.close()
 
 
 if __name__ == "__main__":
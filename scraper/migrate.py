@@ -0,0 +1,16 @@
+"""Apply the schema upgrades to an existing main database and exit.
+
+    python migrate.py
+"""
+
+from main import init_schema
+
+
+def main() -> None:
+    print("Schema upgrade started!")
+    init_schema()
+    print("Schema upgrade finished!")
+
+
+if __name__ == "__main__":
+    main()
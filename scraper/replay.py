@@ -0,0 +1,120 @@
+"""Record-and-replay HTTP transports for running the scraper offline.
+
+`RecordingTransport` saves every API response into a gzip compressed NDJSON
+file keyed by path and query parameters. `ReplayTransport` serves those
+responses back without network access, with optional latency and injected
+errors, so collectors and tasks can be load-tested at any page rate.
+"""
+
+import asyncio
+import gzip
+import json
+import random
+from typing import Any
+from urllib.parse import urlencode
+
+import httpx
+
+
+def request_key(request: httpx.Request) -> str:
+    """Identify a request by its path and sorted query parameters."""
+    params = sorted(request.url.params.multi_items())
+    return f"{request.url.path}?{urlencode(params)}"
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self, path: str, transport: httpx.AsyncBaseTransport | None = None
+    ) -> None:
+        self.path = path
+        self._owns_transport = transport is None
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        await response.aclose()
+
+        record = {
+            "key": request_key(request),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "body": body.decode(),
+        }
+        # Appending opens a new gzip member, readers see one continuous stream.
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+        # The body is already decoded, drop headers that describe the wire format.
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=body)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+        if self._owns_transport:
+            # Collectors reopen their client after close(), keep the transport usable.
+            self.transport = httpx.AsyncHTTPTransport()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        path: str,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.records: dict[str, dict[str, Any]] = {}
+        # Keys answered with a 304 while recording, the body was in the
+        # recorder's HTTP cache and is not in the recording.
+        self.not_modified: set[str] = set()
+
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if record["status"] == httpx.codes.NOT_MODIFIED:
+                    self.not_modified.add(record["key"])
+                else:
+                    self.records[record["key"]] = record
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self._random.uniform(0.5, 1.5) * self.latency)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            if self._random.random() < 0.5:
+                raise httpx.ConnectError("injected connection error", request=request)
+            return httpx.Response(503, headers={"Retry-After": "0"}, request=request)
+
+        key = request_key(request)
+        # Only a conditional request has a cached body a 304 can refer to.
+        conditional = any(
+            name in request.headers for name in ("if-none-match", "if-modified-since")
+        )
+        if conditional and key in self.not_modified:
+            return httpx.Response(httpx.codes.NOT_MODIFIED, request=request)
+
+        record = self.records.get(key)
+        if record is None:
+            return httpx.Response(
+                404,
+                json={"message": f"No recorded response for {key}"},
+                request=request,
+            )
+
+        headers = {}
+        if record["content_type"]:
+            headers["content-type"] = record["content_type"]
+        return httpx.Response(
+            record["status"],
+            headers=headers,
+            content=record["body"].encode(),
+            request=request,
+        )
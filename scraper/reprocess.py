@@ -0,0 +1,90 @@
+"""Rebuild `studies` from the raw page archive instead of crawling again.
+
+    python reprocess.py --workers 8
+
+Pages are decompressed and parsed in a pool of processes, one per core by
+default. When a study appears in several archived pages, the version from the
+most recently fetched page wins. Rows go through the usual content-hash
+upsert, so only studies whose derived fields changed are written.
+
+Pages archived with a `fields` projection only contain those fields. The
+script refuses to run when any archived page lacks a field the parser reads.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from archive import PageArchive
+from data_parser import StudyCollector, StudyRecord
+from db.bulk import StudyBulkWriter
+from db.db import SessionLocal
+from main import init_schema
+from settings import settings
+
+
+def parse_archived_page(root: str, digest: str) -> list[StudyRecord]:
+    records, _ = StudyCollector.parse_records(PageArchive(root).get(digest))
+    return records
+
+
+def reprocess(root: str, workers: int, batch_size: int) -> int:
+    archive = PageArchive(root)
+    digests = archive.latest_digests()
+    print(f"Reprocessing {len(digests)} archived pages with {workers} workers.")
+
+    started = time.perf_counter()
+    latest: dict[str, StudyRecord] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() keeps the manifest order, later pages overwrite earlier ones.
+        for records in executor.map(
+            partial(parse_archived_page, root), digests, chunksize=8
+        ):
+            for record in records:
+                latest[record.id] = record
+    print(f"Parsed {len(latest)} studies in {time.perf_counter() - started:.1f}s.")
+
+    records = list(latest.values())
+    stored = 0
+    session = SessionLocal()
+    try:
+        for start in range(0, len(records), batch_size):
+            end = start + batch_size
+            stored += StudyBulkWriter(session).upsert(records[start:end])
+            session.commit()
+    finally:
+        session.close()
+
+    print(
+        f"{stored} records were inserted or changed "
+        f"in {time.perf_counter() - started:.1f}s."
+    )
+    return stored
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", default=settings.archive_path)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=settings.reprocess_batch_size)
+    args = parser.parse_args()
+
+    if not args.archive:
+        parser.error("no archive, pass --archive or set SCRAPER_ARCHIVE_PATH")
+    incomplete, missing = PageArchive.missing_fields(
+        PageArchive(args.archive).latest_entries(), StudyCollector.fields
+    )
+    if incomplete:
+        parser.error(
+            f"{incomplete} archived pages lack fields the parser reads: "
+            + ", ".join(sorted(missing))
+        )
+
+    init_schema()
+    reprocess(args.archive, args.workers, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
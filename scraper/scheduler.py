@@ -0,0 +1,181 @@
+"""Run the scraper's periodic jobs side by side and keep them running.
+
+Every job has its own interval, jitter, timeout and overlap policy. A run that
+raises or times out is logged and retried with exponential backoff, so one
+failing job never stops the others or the service. Each run logs how long it
+took and how late it started, and `Scheduler` prints a summary of all jobs
+every `report_interval` seconds.
+"""
+
+import asyncio
+import math
+import random
+import time
+import traceback
+from typing import Awaitable, Callable
+
+# What happens to ticks that passed while a run was still going:
+# "skip" drops them and waits for the next tick on the schedule,
+# "delay" starts one run right away and "allow" starts runs on schedule
+# even if earlier ones are still going.
+OVERLAP_POLICIES = ("skip", "delay", "allow")
+
+# A run may return the number of seconds until it should run again, e.g. when
+# its work was not due yet, or None to follow the job's schedule.
+JobRun = Callable[[], Awaitable[float | None]]
+
+
+class JobStats:
+    def __init__(self) -> None:
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.skipped = 0
+        self.running = 0
+        self.last_duration: float | None = None
+        self.last_lag: float | None = None
+        self.max_lag = 0.0
+        self.last_error: str | None = None
+
+    def report(self) -> str:
+        duration = (
+            f"{self.last_duration:.1f}s" if self.last_duration is not None else "-"
+        )
+        lag = f"{self.last_lag:.1f}s" if self.last_lag is not None else "-"
+        report = (
+            f"{self.runs} runs, {self.failures} failed, {self.skipped} ticks skipped, "
+            f"last run {duration}, lag {lag} (max {self.max_lag:.1f}s)"
+        )
+        if self.running:
+            report += f", {self.running} running"
+        if self.consecutive_failures:
+            report += f", failing: {self.last_error}"
+        return report
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        run: JobRun,
+        interval: float,
+        jitter: float = 0.0,
+        timeout: float | None = None,
+        overlap: str = "skip",
+        backoff: float = 10.0,
+        max_backoff: float = 900.0,
+    ) -> None:
+        """Each start is delayed by a random `jitter` seconds at most, so replicas
+        started together do not hit the API in lockstep."""
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"unknown overlap policy {overlap!r}")
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.overlap = overlap
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = JobStats()
+
+    def retry_delay(self) -> float:
+        failures = self.stats.consecutive_failures
+        return min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+
+    def jittered(self, due: float) -> float:
+        return due + random.uniform(0, self.jitter)
+
+
+class Scheduler:
+    def __init__(self, jobs: list[Job], report_interval: float | None = None) -> None:
+        self.jobs = jobs
+        self.report_interval = report_interval
+
+    async def run(self) -> None:
+        async with asyncio.TaskGroup() as group:
+            for job in self.jobs:
+                group.create_task(self._supervise(job))
+            if self.report_interval:
+                group.create_task(self._report())
+
+    def report(self) -> list[str]:
+        return [f"Job {job.name}: {job.stats.report()}" for job in self.jobs]
+
+    async def _supervise(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        # Ticks of the job's schedule, jitter is added to each start only.
+        due = loop.time()
+        overlapping: set[asyncio.Task[tuple[bool, float | None]]] = set()
+
+        try:
+            while True:
+                start_at = job.jittered(due)
+                await asyncio.sleep(max(0.0, start_at - loop.time()))
+                lag = max(0.0, loop.time() - start_at)
+
+                if job.overlap == "allow":
+                    run = asyncio.create_task(self._run(job, lag))
+                    overlapping.add(run)
+                    run.add_done_callback(overlapping.discard)
+                    due += job.interval
+                    continue
+
+                succeeded, retry_in = await self._run(job, lag)
+                now = loop.time()
+                if not succeeded:
+                    due = now + job.retry_delay()
+                elif retry_in is not None:
+                    due = now + retry_in
+                else:
+                    due += job.interval
+                    if due < now and job.overlap == "skip":
+                        missed = math.ceil((now - due) / job.interval)
+                        job.stats.skipped += missed
+                        due += missed * job.interval
+        finally:
+            for run in overlapping:
+                run.cancel()
+
+    async def _run(self, job: Job, lag: float) -> tuple[bool, float | None]:
+        """Run the job once, returning whether it succeeded and its retry hint."""
+        stats = job.stats
+        stats.runs += 1
+        stats.running += 1
+        stats.last_lag = lag
+        stats.max_lag = max(stats.max_lag, lag)
+        started = time.perf_counter()
+
+        try:
+            async with asyncio.timeout(job.timeout):
+                retry_in = await job.run()
+        except Exception as e:
+            duration = time.perf_counter() - started
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_error = repr(e)
+            print(
+                f"Job {job.name} failed after {duration:.1f}s, "
+                f"retrying in {job.retry_delay():.0f}s: {e!r}"
+            )
+            traceback.print_exc()
+            return False, None
+        finally:
+            stats.running -= 1
+            stats.last_duration = time.perf_counter() - started
+
+        stats.consecutive_failures = 0
+        if retry_in is None:
+            # Runs that only found their work not due yet are not logged.
+            print(
+                f"Job {job.name} finished in {stats.last_duration:.1f}s, "
+                f"started {lag:.1f}s late."
+            )
+        return True, retry_in
+
+    async def _report(self) -> None:
+        assert self.report_interval
+        while True:
+            await asyncio.sleep(self.report_interval)
+            for line in self.report():
+                print(line)
@@ -1,7 +1,34 @@
 import asyncio
-from data_parser import StudyCollector
-from db.models import Study
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import date, datetime, timedelta
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    NamedTuple,
+)
+import httpx
+from archive import PageArchive
+from data_parser import (
+    ClinicalSearchAreaDTO,
+    ClinicalTrialsStudyDTO,
+    StudyCollector,
+    StudyRecord,
+    StudySearchAreasCollector,
+)
+from db.bulk import StudyBulkWriter, StudyRow
+from db.index import KnownStudyIndex
+from db.models import CrawlState
+from db.queue import ClaimedUnit, LeaseLost, WorkQueue
 from db.db import get_db
+from settings import settings
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
@@ -15,53 +42,892 @@ class DummyTestTask:
             await asyncio.sleep(600)
 
 
+# Pages parsed by the streaming path hold DTOs, the batched path StudyRecords.
+Study = ClinicalTrialsStudyDTO | StudyRecord
+
+
+class PageChunk(NamedTuple):
+    """Part of a page, written as soon as it was parsed.
+
+    Only the last chunk of a page knows the next page token, so only its
+    write moves the stored cursor forward.
+    """
+
+    studies: list[Study]
+    last: bool
+    next_page_token: str | None = None
+
+
+# (page token, next page token, body) and (page token, chunk of that page)
+RawPage = tuple[str | None, str | None, bytes]
+ParsedChunk = tuple[str | None, PageChunk]
+
+
+class StageStats:
+    """Throughput of one pipeline stage.
+
+    `busy_time` is spent on the stage's own work, `wait_time` on an empty
+    input queue or a full output queue. The stage with the least waiting is
+    the one limiting the pipeline.
+    """
+
+    def __init__(self, name: str, unit: str = "studies") -> None:
+        self.name = name
+        self.unit = unit
+        self.pages = 0
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    @contextmanager
+    def busy(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy_time += time.perf_counter() - started
+
+    @contextmanager
+    def waiting(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wait_time += time.perf_counter() - started
+
+    def report(self) -> str:
+        rate = self.pages / self.busy_time if self.busy_time else 0.0
+        return (
+            f"{self.name}: {self.pages} pages, {self.items} {self.unit}, "
+            f"{rate:.2f} pages/s busy, busy {self.busy_time:.1f}s, "
+            f"waiting {self.wait_time:.1f}s"
+        )
+
+
+def _load_crawl_state(session: Session, name: str) -> CrawlState:
+    state = session.get(CrawlState, name)
+    if state is None:
+        state = CrawlState(name=name, page_token=None, page_count=0)
+        session.add(state)
+    return state
+
+
+def _study_rows(studies: Iterable[Study]) -> Iterator[StudyRow]:
+    for _dto in studies:
+        if isinstance(_dto, StudyRecord):
+            yield _dto
+            continue
+        organization = _dto.organization
+        yield (
+            _dto.id,
+            _dto.title,
+            organization.name if organization else None,
+            organization.type if organization else None,
+        )
+
+
 class CollectStudiesTask:
+    crawl_name = "studies"
+
+    _archive: PageArchive | None = None
+    _index: KnownStudyIndex | None = None
+    _queue: WorkQueue | None = None
 
     @classmethod
-    async def collect(cls) -> None:
+    def get_archive(cls) -> PageArchive | None:
+        """The raw page archive, or None when SCRAPER_ARCHIVE_PATH is not set."""
+        if settings.archive_path is None:
+            return None
+        if CollectStudiesTask._archive is None:
+            CollectStudiesTask._archive = PageArchive(
+                settings.archive_path, max_bytes=settings.archive_max_mb * 1024 * 1024
+            )
+        return CollectStudiesTask._archive
+
+    @classmethod
+    def get_collector(cls, concurrency: int) -> StudyCollector:
+        # Archived pages are fetched whole, so reprocessing can derive fields
+        # the crawl itself does not read.
+        return StudyCollector(
+            concurrency=concurrency, project_fields=cls.get_archive() is None
+        )
+
+    @classmethod
+    def prune_archive(cls) -> None:
+        archive = cls.get_archive()
+        if archive is None:
+            return
+        removed = archive.prune()
+        if removed:
+            print(f"Task {cls.__name__} pruned {removed} pages from the archive.")
+
+    @classmethod
+    def get_index(cls) -> KnownStudyIndex | None:
+        """Stored ids and content hashes, None when SCRAPER_KNOWN_ID_INDEX is off."""
+        if not settings.known_id_index:
+            return None
+        if CollectStudiesTask._index is None:
+            CollectStudiesTask._index = cls.load_index()
+        return CollectStudiesTask._index
+
+    @classmethod
+    def get_queue(cls) -> WorkQueue:
+        """The crawl unit queue, with one lease owner for the whole process."""
+        if CollectStudiesTask._queue is None:
+            CollectStudiesTask._queue = WorkQueue(lease_seconds=settings.lease_seconds)
+        return CollectStudiesTask._queue
+
+    @classmethod
+    def load_index(cls) -> KnownStudyIndex:
+        started = time.perf_counter()
+        session: Session = next(get_db())
+        try:
+            index = KnownStudyIndex().load(session)
+        finally:
+            session.close()
+        print(
+            f"Task {cls.__name__} loaded {len(index)} known studies "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+        return index
+
+    @classmethod
+    async def setup(cls) -> None:
+        # The crawl logs the projected page sizes as it goes, the comparison
+        # with unprojected pages costs an extra full page and is opt-in.
+        if not settings.measure_projection:
+            return
+        collector = StudyCollector(concurrency=settings.fetch_concurrency)
+        try:
+            await collector.log_projection_savings(pageSize=settings.page_size)
+        except httpx.HTTPError as e:
+            print(f"Task {cls.__name__} could not measure the field projection: {e}")
+
+    @classmethod
+    async def run_once(cls) -> float | None:
+        """Walk the whole token chain once, resuming from the stored page token."""
+        return await cls._run_leased(settings.crawl_interval, cls._pass)
+
+    @classmethod
+    async def _pass(cls) -> None:
+        collector = cls.get_collector(settings.fetch_concurrency)
+        next_page_token = cls._load_page_token()
+        if next_page_token:
+            print(f"Task {cls.__name__} resumes from the stored page token.")
+        if settings.known_id_index:
+            # Reloaded every pass to pick up writes from other processes.
+            index = await asyncio.to_thread(cls.load_index)
+            CollectStudiesTask._index = index
+        try:
+            await cls._crawl(collector, next_page_token)
+            return
+        except ExceptionGroup as group:
+            if not cls._rejected(group, next_page_token):
+                raise
+        await asyncio.to_thread(cls._reset_page_token)
+        await cls._crawl(collector, None)
+
+    @classmethod
+    def _rejected(cls, error: BaseException, page_token: str | None) -> bool:
+        """True when the API refused the resumed `page_token` with a 4xx.
+
+        A stored token stops working when it expires or when
+        SCRAPER_PAGE_SIZE or the `fields` projection changed, retrying it
+        would never get past it.
+        """
+        if page_token is None:
+            return False
+        errors = error.exceptions if isinstance(error, BaseExceptionGroup) else [error]
+        for e in errors:
+            if (
+                isinstance(e, httpx.HTTPStatusError)
+                and e.response.is_client_error
+                and e.response.status_code != httpx.codes.TOO_MANY_REQUESTS
+                and e.request.url.params.get("pageToken") == page_token
+            ):
+                print(
+                    f"Task {cls.__name__}: the stored page token was rejected "
+                    f"with HTTP {e.response.status_code}, starting over from page 1."
+                )
+                return True
+        return False
+
+    @classmethod
+    async def _run_leased(
+        cls, interval: float, crawl: Callable[[], Awaitable[None]]
+    ) -> float | None:
+        """Run `crawl` while holding the lease on the task's crawl unit.
+
+        Only the instance holding the lease walks the token chain. When the
+        unit is not due yet or another instance holds it, returns the number
+        of seconds after which the scheduler should try again.
+        """
+        await asyncio.to_thread(cls._enqueue, [(cls.crawl_name, None)])
+        unit = await asyncio.to_thread(cls._claim, [cls.crawl_name])
+        if unit is None:
+            return settings.queue_poll_interval
+
+        print(f"Task {cls.__name__} started!")
+        started = time.monotonic()
+        try:
+            async with cls._leased(unit.name):
+                await crawl()
+                await asyncio.to_thread(cls.prune_archive)
+        except LeaseLost:
+            print(f"Task {cls.__name__} lost the lease on {unit.name}.")
+            return 0
+        except BaseException:
+            # Handed back at once, so a retry need not wait for the lease to expire.
+            await asyncio.to_thread(cls._release, unit.name)
+            raise
+
+        # The unit is due again at the next tick of the schedule.
+        elapsed = time.monotonic() - started
+        await asyncio.to_thread(
+            cls._release, unit.name, available_in=max(0.0, interval - elapsed)
+        )
+        print(f"Task {cls.__name__} finished!")
+        return None
+
+    @classmethod
+    @asynccontextmanager
+    async def _leased(cls, name: str) -> AsyncIterator[None]:
+        """Renew the lease on `name` in the background while the body runs.
 
-        collector = StudyCollector()
+        Every write renews the lease as well, the background heartbeat keeps
+        it alive while no page is written, e.g. during rate-limit backoff.
+        """
 
-        initial_dto_list = collector.get_dto_list(pageSize=1000)
-        next_page_token = initial_dto_list.next_page_token
+        async def renew() -> None:
+            while True:
+                await asyncio.sleep(settings.lease_seconds / 3)
+                if not await asyncio.to_thread(cls._heartbeat, name):
+                    # The next write raises LeaseLost and ends the crawl.
+                    return
+
+        renewer = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+
+    @classmethod
+    def _streaming(cls) -> bool:
+        # Archived pages need the whole body, so they skip the streaming path.
+        return settings.stream_pages and cls.get_archive() is None
+
+    @classmethod
+    async def _crawl(cls, collector: StudyCollector, page_token: str | None) -> None:
+        """Walk one token chain as a pipeline of stages joined by bounded queues.
+
+        With SCRAPER_STREAM_PAGES, one stage parses each page while its body
+        arrives and hands chunks of SCRAPER_WRITE_CHUNK_SIZE studies to the
+        write stage, no whole body is held. Otherwise pages go through fetch
+        -> parse -> write, so page N+1 downloads while page N is parsed and
+        page N-1 is written. Either way a slow stage holds back the ones
+        before it instead of piling up pages in memory.
+        """
+        chunks: asyncio.Queue[ParsedChunk | None] = asyncio.Queue(
+            maxsize=settings.pipeline_queue_size
+        )
+        raw_pages: asyncio.Queue[RawPage | None] = asyncio.Queue(
+            maxsize=settings.pipeline_queue_size
+        )
+        streaming = cls._streaming()
+        if streaming:
+            stages = [StageStats("fetch+parse")]
+        else:
+            stages = [StageStats("fetch", unit="KiB"), StageStats("parse")]
+        stages.append(StageStats("write", unit="rows written"))
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                if streaming:
+                    group.create_task(
+                        cls._stream_stage(collector, page_token, chunks, stages[0])
+                    )
+                else:
+                    group.create_task(
+                        cls._fetch_stage(collector, page_token, raw_pages, stages[0])
+                    )
+                    group.create_task(cls._parse_stage(raw_pages, chunks, stages[1]))
+                group.create_task(cls._write_stage(chunks, stages[-1]))
+        except* LeaseLost as group:
+            raise group.exceptions[0] from None
+        finally:
+            for stage in stages:
+                print(f"Task {cls.__name__} {stage.report()}")
+
+    @classmethod
+    async def _stream_stage(
+        cls,
+        collector: StudyCollector,
+        page_token: str | None,
+        chunks: asyncio.Queue[ParsedChunk | None],
+        stats: StageStats,
+    ) -> None:
         while True:
-            print(f"Task {cls.__name__} started!")
-            _only_studies_list = []
-            new_dto_list = collector.get_dto_list(
-                pageSize=1000, pageToken=next_page_token
+            page = cls._page_chunks(
+                collector, pageSize=settings.page_size, pageToken=page_token
             )
+            next_page_token = None
+            while True:
+                with stats.busy():
+                    chunk = await anext(page, None)
+                if chunk is None:
+                    break
+                with stats.waiting():
+                    await chunks.put((page_token, chunk))
+                stats.items += len(chunk.studies)
+                if chunk.last:
+                    stats.pages += 1
+                    next_page_token = chunk.next_page_token
 
-            _only_studies_list = new_dto_list.studies
+            if not next_page_token:
+                break
+            page_token = next_page_token
 
-            if initial_dto_list is not None:
-                _only_studies_list.extend(initial_dto_list.studies)
+        await chunks.put(None)
 
-            session: Session = next(get_db())
+    @classmethod
+    async def _fetch_stage(
+        cls,
+        collector: StudyCollector,
+        page_token: str | None,
+        raw_pages: asyncio.Queue[RawPage | None],
+        stats: StageStats,
+    ) -> None:
+        archive = cls.get_archive()
+        while True:
+            with stats.busy():
+                params = {"pageSize": settings.page_size, "pageToken": page_token}
+                raw = await collector.get_raw_data(**params)
+                next_page_token = StudyCollector.find_next_page_token(raw)
+                if archive is not None:
+                    await asyncio.to_thread(
+                        archive.put, raw, cls.crawl_name, params, collector.projection
+                    )
+            with stats.waiting():
+                await raw_pages.put((page_token, next_page_token, raw))
+            stats.pages += 1
+            stats.items += len(raw) // 1024
+
+            if not next_page_token:
+                break
+            page_token = next_page_token
+
+        await raw_pages.put(None)
+
+    @classmethod
+    async def _parse_stage(
+        cls,
+        raw_pages: asyncio.Queue[RawPage | None],
+        chunks: asyncio.Queue[ParsedChunk | None],
+        stats: StageStats,
+    ) -> None:
+        while True:
+            with stats.waiting():
+                item = await raw_pages.get()
+            if item is None:
+                break
+
+            page_token, next_page_token, raw = item
+            # Parsed in a thread, the fetch stage keeps reading its socket.
+            with stats.busy():
+                studies, _ = await asyncio.to_thread(StudyCollector.parse_records, raw)
+            chunk = PageChunk(list(studies), last=True, next_page_token=next_page_token)
+            with stats.waiting():
+                await chunks.put((page_token, chunk))
+            stats.pages += 1
+            stats.items += len(studies)
 
-            existing_ids = {
-                row[0]
-                for row in session.query(Study.id)
-                .filter(Study.id.in_([dto.id for dto in _only_studies_list]))
-                .all()
-            }
+        await chunks.put(None)
 
-            bulk = [
-                Study(
-                    id=_dto.id,
-                    title=_dto.title,
-                    organization_name=_dto.organization.name,
-                    organization_type=_dto.organization.type,
+    @classmethod
+    async def _write_stage(
+        cls, chunks: asyncio.Queue[ParsedChunk | None], stats: StageStats
+    ) -> None:
+        page_stored = 0
+        while True:
+            with stats.waiting():
+                item = await chunks.get()
+            if item is None:
+                break
+
+            # Chunks are written in order, so the stored cursor never runs
+            # ahead of the data that was committed.
+            page_token, chunk = item
+            with stats.busy():
+                stored = await asyncio.to_thread(
+                    cls._store,
+                    chunk.studies,
+                    page_token,
+                    chunk.next_page_token,
+                    page_done=chunk.last,
                 )
-                for _dto in _only_studies_list
-                if _dto.id not in existing_ids
-            ]
-            session.bulk_save_objects(bulk)
+            stats.items += stored
+            page_stored += stored
+            if not chunk.last:
+                continue
+
+            stats.pages += 1
+            print(f"{page_stored} records were inserted or changed.")
+            page_stored = 0
+            if stats.pages % settings.pipeline_report_every == 0:
+                print(f"Task {cls.__name__} {stats.report()}")
+
+    @classmethod
+    async def _page_chunks(
+        cls, collector: StudyCollector, crawl_name: str | None = None, **params: Any
+    ) -> AsyncIterator[PageChunk]:
+        """Fetch one page and yield it in chunks.
+
+        With SCRAPER_STREAM_PAGES, studies are parsed while the body arrives
+        and yielded every SCRAPER_WRITE_CHUNK_SIZE studies, so memory does not
+        grow with the page size. Otherwise the page is one chunk.
+        """
+        archive = cls.get_archive()
+        if cls._streaming():
+            stream = collector.stream_dto_list(**params)
+            studies: list[Study] = []
+            async for _dto in stream:
+                studies.append(_dto)
+                if len(studies) >= settings.write_chunk_size:
+                    yield PageChunk(studies, last=False)
+                    studies = []
+            yield PageChunk(
+                studies, last=True, next_page_token=stream.next_page_token or None
+            )
+            return
+
+        raw = await collector.get_raw_data(**params)
+        if archive is not None:
+            await asyncio.to_thread(
+                archive.put,
+                raw,
+                crawl_name or cls.crawl_name,
+                params,
+                collector.projection,
+            )
+        records, next_page_token = await asyncio.to_thread(
+            StudyCollector.parse_records, raw
+        )
+        yield PageChunk(list(records), last=True, next_page_token=next_page_token)
+
+    @classmethod
+    def _load_page_token(cls, crawl_name: str | None = None) -> str | None:
+        session: Session = next(get_db())
+        try:
+            state = session.get(CrawlState, crawl_name or cls.crawl_name)
+            return state.page_token if state is not None else None
+        finally:
+            session.close()
+
+    @classmethod
+    def _reset_page_token(cls, crawl_name: str | None = None) -> None:
+        session: Session = next(get_db())
+        try:
+            _load_crawl_state(session, crawl_name or cls.crawl_name).page_token = None
+            session.commit()
+        finally:
+            session.close()
+
+    @classmethod
+    def _enqueue(
+        cls,
+        units: Iterable[tuple[str, str | None]],
+        finished: Collection[str] = (),
+        restart: bool = False,
+    ) -> None:
+        session: Session = next(get_db())
+        try:
+            cls.get_queue().enqueue(session, units, finished=finished, restart=restart)
             session.commit()
+        finally:
+            session.close()
 
-            # Overwrite
-            initial_dto_list = None
-            next_page_token = new_dto_list.next_page_token
+    @classmethod
+    def _claim(cls, names: Collection[str]) -> ClaimedUnit | None:
+        session: Session = next(get_db())
+        try:
+            unit = cls.get_queue().claim(session, names)
+            session.commit()
+            return unit
+        finally:
+            session.close()
 
-            print(f"{len(bulk)} records were stored.")
-            print(f"Task {cls.__name__} finished!")
-            await asyncio.sleep(120)
+    @classmethod
+    def _heartbeat(cls, name: str) -> bool:
+        session: Session = next(get_db())
+        try:
+            held = cls.get_queue().heartbeat(session, name)
+            session.commit()
+            return held
+        finally:
+            session.close()
+
+    @classmethod
+    def _release(
+        cls, name: str, finished: bool = False, available_in: float = 0
+    ) -> None:
+        session: Session = next(get_db())
+        try:
+            cls.get_queue().release(session, name, finished, available_in)
+            session.commit()
+        finally:
+            session.close()
+
+    @classmethod
+    def _store(
+        cls,
+        studies: list[Study],
+        page_token: str | None,
+        next_page_token: str | None,
+        watermark: date | None = None,
+        crawl_name: str | None = None,
+        page_done: bool = True,
+    ) -> int:
+        """Upsert `studies` and, once `page_done`, move the cursor past the page.
+
+        Earlier chunks of a page leave the cursor on it, a restart fetches the
+        page again and the upsert skips what was already written.
+        """
+        session: Session = next(get_db())
+        crawl_name = crawl_name or cls.crawl_name
+
+        try:
+            writer = StudyBulkWriter(session, index=cls.get_index())
+            stored = writer.upsert(_study_rows(studies))
+
+            # The cursor is committed together with the batch, so a restart
+            # never skips or re-downloads a page.
+            if page_done:
+                state = _load_crawl_state(session, crawl_name)
+                state.page_token = next_page_token
+                state.page_count = state.page_count + 1 if page_token else 1
+                state.last_success_at = datetime.now()
+                if watermark is not None:
+                    state.watermark = watermark
+
+            # The lease is renewed in the same transaction. If it expired,
+            # another instance may own the unit and this batch is dropped.
+            if not cls.get_queue().heartbeat(session, crawl_name):
+                session.rollback()
+                raise LeaseLost(crawl_name)
+            session.commit()
+            writer.commit_index()
+        finally:
+            session.close()
+
+        return stored
+
+
+class DeltaSyncStudiesTask(CollectStudiesTask):
+    """Fetch only the studies updated since the stored high-water mark."""
+
+    crawl_name = "studies_delta"
+
+    @classmethod
+    async def run_once(cls) -> float | None:
+        return await cls._run_leased(settings.delta_sync_interval, cls._pass)
+
+    @classmethod
+    async def _pass(cls) -> None:
+        collector = cls.get_collector(settings.fetch_concurrency)
+        since, next_page_token = cls._load_delta_state()
+        resumed = next_page_token
+        newest = since
+        synced = 0
+
+        while True:
+            page_token = next_page_token
+            try:
+                async for chunk in cls._page_chunks(
+                    collector,
+                    **collector.updated_since_params(since),
+                    pageSize=settings.page_size,
+                    pageToken=page_token,
+                ):
+                    dates = [
+                        s.last_update_date for s in chunk.studies if s.last_update_date
+                    ]
+                    newest = max([newest, *dates])
+                    next_page_token = chunk.next_page_token
+
+                    # The mark only moves once the whole chain was applied, the
+                    # page token is bound to the `since` filter of this pass.
+                    synced += await asyncio.to_thread(
+                        cls._store,
+                        chunk.studies,
+                        page_token,
+                        next_page_token,
+                        watermark=None if next_page_token else newest,
+                        page_done=chunk.last,
+                    )
+            except httpx.HTTPStatusError as e:
+                if page_token != resumed or not cls._rejected(e, page_token):
+                    raise
+                await asyncio.to_thread(cls._reset_page_token)
+                next_page_token = resumed = None
+                continue
+            if not next_page_token:
+                break
+
+        print(f"{synced} records updated since {since.isoformat()}.")
+
+    @classmethod
+    def _load_delta_state(cls) -> tuple[date, str | None]:
+        session: Session = next(get_db())
+        try:
+            state = session.get(CrawlState, cls.crawl_name)
+            if state is None or state.watermark is None:
+                since = date.today() - timedelta(days=settings.delta_sync_lookback_days)
+                return since, None
+            return state.watermark, state.page_token
+        finally:
+            session.close()
+
+
+class BackfillStudiesTask(CollectStudiesTask):
+    """Load the whole registry through independent LastUpdatePostDate partitions.
+
+    Each partition is one year with its own page-token chain and crawl_state
+    row, so partitions run side by side in a pool of async workers and a
+    restarted backfill skips finished partitions and resumes unfinished ones.
+    Partitions are leased from `crawl_queue`, several backfill processes on
+    different hosts share the work. The upsert keeps the merge free of
+    duplicates.
+    """
+
+    crawl_name = "backfill"
+
+    @classmethod
+    def partitions(cls, start_year: int, end_year: int) -> list[tuple[str, str]]:
+        """Return (crawl name, filter.advanced) pairs covering every study."""
+        partitions = []
+        for year in range(start_year, end_year + 1):
+            low = "MIN" if year == start_year else f"{year}-01-01"
+            high = "MAX" if year == end_year else f"{year}-12-31"
+            partitions.append(
+                (
+                    f"{cls.crawl_name}:{low}:{high}",
+                    f"AREA[LastUpdatePostDate]RANGE[{low},{high}]",
+                )
+            )
+        return partitions
+
+    @classmethod
+    async def run(
+        cls, workers: int, start_year: int, end_year: int, restart: bool = False
+    ) -> None:
+        print(f"Task {cls.__name__} started!")
+        partitions = cls.partitions(start_year, end_year)
+        names = [name for name, _ in partitions]
+        await asyncio.to_thread(cls._enqueue_partitions, partitions, restart)
+        pending = await asyncio.to_thread(cls._unfinished, names)
+        print(f"Task {cls.__name__}: {pending} partitions, {workers} workers.")
+
+        collector = cls.get_collector(workers)
+        try:
+            # A failing worker cancels the others, and all of them are done
+            # before the shared client is closed.
+            async with asyncio.TaskGroup() as group:
+                for _ in range(workers):
+                    group.create_task(cls._worker(collector, names))
+        finally:
+            await collector.close()
+        await asyncio.to_thread(cls.prune_archive)
+        print(f"Task {cls.__name__} finished!")
+
+    @classmethod
+    async def _worker(cls, collector: StudyCollector, names: list[str]) -> None:
+        while True:
+            unit = await asyncio.to_thread(cls._claim, names)
+            if unit is None:
+                # Partitions leased by other instances are picked up again
+                # if their lease expires, so wait until all are finished.
+                if not await asyncio.to_thread(cls._unfinished, names):
+                    return
+                await asyncio.sleep(settings.queue_poll_interval)
+                continue
+
+            try:
+                async with cls._leased(unit.name):
+                    stored = await cls._crawl_partition(collector, unit)
+            except LeaseLost:
+                print(f"Partition {unit.name}: lost the lease.")
+                continue
+            except BaseException:
+                # Handed back at once, so a retry need not wait for the lease to expire.
+                await asyncio.to_thread(cls._release, unit.name)
+                raise
+
+            await asyncio.to_thread(cls._release, unit.name, finished=True)
+            print(f"Partition {unit.name}: {stored} records were inserted or changed.")
+
+    @classmethod
+    async def _crawl_partition(
+        cls, collector: StudyCollector, unit: ClaimedUnit
+    ) -> int:
+        next_page_token = cls._load_page_token(unit.name)
+        resumed = next_page_token
+        stored = 0
+
+        while True:
+            page_token = next_page_token
+            try:
+                async for chunk in cls._page_chunks(
+                    collector,
+                    crawl_name=unit.name,
+                    **{"filter.advanced": unit.query},
+                    pageSize=settings.page_size,
+                    pageToken=page_token,
+                ):
+                    next_page_token = chunk.next_page_token
+                    # Writes run in a thread so other partitions keep fetching.
+                    stored += await asyncio.to_thread(
+                        cls._store,
+                        chunk.studies,
+                        page_token,
+                        next_page_token,
+                        watermark=None if next_page_token else date.today(),
+                        crawl_name=unit.name,
+                        page_done=chunk.last,
+                    )
+            except httpx.HTTPStatusError as e:
+                if page_token != resumed or not cls._rejected(e, page_token):
+                    raise
+                await asyncio.to_thread(cls._reset_page_token, unit.name)
+                next_page_token = resumed = None
+                continue
+            if not next_page_token:
+                return stored
+
+    @classmethod
+    def _enqueue_partitions(
+        cls, partitions: list[tuple[str, str]], restart: bool
+    ) -> None:
+        if not restart:
+            # Partitions finished before the queue existed are not crawled again.
+            finished = [name for name, _ in partitions if cls._is_finished(name)]
+            cls._enqueue(partitions, finished=finished)
+            return
+
+        # Every partition starts over from its first page.
+        session: Session = next(get_db())
+        try:
+            for name, _ in partitions:
+                _load_crawl_state(session, name).page_token = None
+            session.commit()
+        finally:
+            session.close()
+        cls._enqueue(partitions, restart=True)
+
+    @classmethod
+    def _unfinished(cls, names: Collection[str]) -> int:
+        session: Session = next(get_db())
+        try:
+            return cls.get_queue().unfinished(session, names)
+        finally:
+            session.close()
+
+    @classmethod
+    def _is_finished(cls, crawl_name: str) -> bool:
+        session: Session = next(get_db())
+        try:
+            state = session.get(CrawlState, crawl_name)
+            return (
+                state is not None
+                and state.watermark is not None
+                and state.page_token is None
+            )
+        finally:
+            session.close()
+
+
+class CollectSearchAreasTask:
+    """Keep the search-areas taxonomy in `search_areas` up to date.
+
+    The taxonomy rarely changes, it is fetched through the HTTP cache and
+    only parsed and stored again when the response changed.
+    """
+
+    # The first pass stores the taxonomy even when the cache says it is
+    # unchanged, the table may have been emptied in the meantime.
+    _stored = False
+
+    @classmethod
+    async def run_once(cls) -> None:
+        print(f"Task {cls.__name__} started!")
+        collector = StudySearchAreasCollector()
+        dto = await collector.get_dto_list(changed_only=cls._stored)
+        if dto is None:
+            print("Search areas are unchanged.")
+        else:
+            stored = await asyncio.to_thread(cls._store, dto.areas)
+            print(f"{stored} search areas were stored.")
+        cls._stored = True
+        print(f"Task {cls.__name__} finished!")
+
+    @classmethod
+    def _store(cls, areas: list[ClinicalSearchAreaDTO]) -> int:
+        session: Session = next(get_db())
+        # Every replica runs the task, so the taxonomy is upserted rather than
+        # deleted and inserted again, and concurrent passes cannot collide on
+        # the primary key or leave the table empty. Rows are written in key
+        # order, so two passes lock them in the same order.
+        areas = sorted(
+            {(area.document, area.name): area for area in areas}.values(),
+            key=lambda area: (area.document, area.name),
+        )
+
+        try:
+            for area in areas:
+                session.execute(
+                    text(
+                        """
+                        INSERT INTO search_areas
+                            (document, name, param, ui_label, fields, updated_at)
+                        VALUES (
+                            :document, :name, :param, :ui_label,
+                            CAST(:fields AS json), LOCALTIMESTAMP
+                        )
+                        ON CONFLICT (document, name) DO UPDATE SET
+                            param = EXCLUDED.param,
+                            ui_label = EXCLUDED.ui_label,
+                            fields = EXCLUDED.fields,
+                            updated_at = EXCLUDED.updated_at
+                        """
+                    ),
+                    {
+                        "document": area.document,
+                        "name": area.name,
+                        "param": area.param,
+                        "ui_label": area.ui_label,
+                        "fields": json.dumps(area.fields),
+                    },
+                )
+            # Areas removed upstream go too.
+            session.execute(
+                text(
+                    """
+                    DELETE FROM search_areas
+                    WHERE NOT EXISTS (
+                        SELECT 1
+                        FROM unnest(CAST(:documents AS text[]), CAST(:names AS text[]))
+                            AS kept (document, name)
+                        WHERE kept.document = search_areas.document
+                        AND kept.name = search_areas.name
+                    )
+                    """
+                ),
+                {
+                    "documents": [area.document for area in areas],
+                    "names": [area.name for area in areas],
+                },
+            )
+            session.commit()
+        finally:
+            session.close()
+
+        return len(areas)
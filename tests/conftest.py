@@ -1,15 +1,20 @@
 import pytest
 import os
+import sys
+import importlib
 import logging
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Integer
 from datetime import datetime, timedelta
 
 from api.main import app
 from api.db.db import Base, get_db
-from api.db.models import Study, User
+
+# The app imports its models as `db.models`, importing them under a second
+# module name would map the same tables twice.
+from db.models import Organization, Study, User
 from api.utils.security import (
     get_password_hash,
     create_access_token,
@@ -86,13 +91,19 @@ def setup_test_db():
 
         TempBase = declarative_base()
 
+        class TempOrganization(TempBase):
+            __tablename__ = "organizations"
+
+            id = Column(Integer, primary_key=True)
+            name = Column(String, nullable=True)
+            type = Column(String, nullable=True)
+
         class TempStudy(TempBase):
             __tablename__ = "studies"
 
             id = Column(String, primary_key=True)
             title = Column(String, nullable=True)
-            organization_name = Column(String, nullable=True)
-            organization_type = Column(String, nullable=True)
+            organization_id = Column(Integer, nullable=True)
             created_at = Column(DateTime, nullable=False)
             updated_at = Column(DateTime, nullable=False)
 
@@ -155,6 +166,7 @@ def clean_tables():
         logger.info("Cleaning tables after test...")
         if check_tables():
             db.query(Study).delete()
+            db.query(Organization).delete()
             db.commit()
         else:
             logger.error("Cannot clean tables - they don't exist!")
@@ -232,3 +244,77 @@ def test_user():
         is_admin=True,
         created_at=datetime.now(),
     )
+
+
+# The scraper imports its modules by top-level name (`settings`, `db`, ...),
+# as the api does, so its task modules are imported from the scraper directory
+# and the api's modules are put back afterwards.
+SCRAPER_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scraper")
+SCRAPER_MODULES = {
+    "archive",
+    "data_parser",
+    "db",
+    "main",
+    "replay",
+    "scheduler",
+    "settings",
+    "tasks",
+}
+
+
+def _scraper_module(name):
+    return name.split(".")[0] in SCRAPER_MODULES
+
+
+# Fixture to import scraper/tasks.py the way the scraper runs it
+@pytest.fixture(scope="module")
+def scraper_tasks():
+    saved = {
+        name: module for name, module in sys.modules.items() if _scraper_module(name)
+    }
+    for name in saved:
+        del sys.modules[name]
+    sys.path.insert(0, SCRAPER_DIR)
+    try:
+        yield importlib.import_module("tasks")
+    finally:
+        sys.path.remove(SCRAPER_DIR)
+        for name in [name for name in sys.modules if _scraper_module(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+
+
+# Fixture for a scraper database. The crawl queue relies on PostgreSQL
+# (SKIP LOCKED, database clock), so these tests need one in
+# SCRAPER_TEST_DATABASE_URL and are skipped without it.
+@pytest.fixture(scope="function")
+def scraper_db(scraper_tasks, monkeypatch):
+    url = os.environ.get("SCRAPER_TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("SCRAPER_TEST_DATABASE_URL is not set")
+
+    engine = create_engine(url, echo=False)
+    scraper_tasks.CrawlState.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(
+            text("TRUNCATE crawl_queue, crawl_state, studies, organizations CASCADE")
+        )
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_scraper_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(scraper_tasks, "get_db", get_scraper_db)
+    monkeypatch.setattr(scraper_tasks.settings, "known_id_index", False)
+    # Organization ids cached by an earlier test are gone with the truncate.
+    monkeypatch.setattr(
+        scraper_tasks.StudyBulkWriter,
+        "organizations",
+        type(scraper_tasks.StudyBulkWriter.organizations)(),
+    )
+    yield SessionLocal
+    engine.dispose()
@@ -0,0 +1,424 @@
+import asyncio
+import gzip
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+import pytest
+
+from analysis_service.assets import accepts_gzip, publish_asset
+from analysis_service.deltas import statistics_deltas, study_deltas
+from analysis_service.listener import CHANNEL, ChangeListener, debounce
+from analysis_service.loop_monitor import LoopLagMonitor
+from analysis_service.render_cache import RenderCache
+from analysis_service.snapshots import DashboardSnapshots, file_snapshot
+
+
+class TestRenderCache:
+    def test_concurrent_viewers_share_one_render(self):
+        cache = RenderCache()
+        renders = []
+        release = threading.Event()
+
+        def render():
+            renders.append(1)
+            release.wait(5)
+            return "<html>"
+
+        async def run():
+            viewers = [
+                asyncio.create_task(cache.get(10, lambda: asyncio.to_thread(render)))
+                for _ in range(20)
+            ]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*viewers)
+
+        assert asyncio.run(run()) == ["<html>"] * 20
+        assert len(renders) == 1
+        assert cache.misses == 1
+
+    def test_bump_invalidates_pages(self):
+        cache = RenderCache()
+        pages = iter(["first", "second"])
+
+        async def run():
+            async def render():
+                return next(pages)
+
+            first = await cache.get(10, render)
+            cached = await cache.get(10, render)
+            cache.bump()
+            return first, cached, await cache.get(10, render)
+
+        assert asyncio.run(run()) == ("first", "first", "second")
+        assert cache.hits == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(maxsize=2)
+        renders = []
+
+        async def render(top_n):
+            renders.append(top_n)
+            return str(top_n)
+
+        async def run():
+            for top_n in (5, 10, 5, 15, 5, 10):
+                await cache.get(top_n, lambda: render(top_n))
+
+        asyncio.run(run())
+        # 10 was the least recently used page when 15 was added.
+        assert renders == [5, 10, 15, 10]
+
+    def test_failed_render_is_not_cached(self):
+        cache = RenderCache()
+        calls = []
+
+        async def render():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database is down")
+            return "<html>"
+
+        async def run():
+            try:
+                await cache.get(10, render)
+            except RuntimeError:
+                pass
+            return await cache.get(10, render)
+
+        assert asyncio.run(run()) == "<html>"
+        assert len(calls) == 2
+
+
+class TestDashboardSnapshots:
+    def test_publishes_data_with_validators(self, tmp_path):
+        snapshots = DashboardSnapshots(str(tmp_path))
+        assert snapshots.get(10) is None
+
+        first = snapshots.write(10, '{"top":1}')
+        assert snapshots.get(10) == first
+        assert open(first.path).read() == '{"top":1}'
+        # Unchanged data keeps its ETag and Last-Modified time.
+        assert snapshots.write(10, '{"top":1}') == first
+
+        second = snapshots.write(10, '{"top":2}')
+        assert second.etag != first.etag
+        assert snapshots.get(10) == second
+        assert snapshots.get(15) is None
+
+    def test_retain_drops_unconfigured_tops(self, tmp_path):
+        snapshots = DashboardSnapshots(str(tmp_path))
+        kept = snapshots.write(10, '{"top":10}')
+        snapshots.write(25, '{"top":25}')
+
+        snapshots.retain([10, 15])
+        assert snapshots.get(10) == kept
+        assert snapshots.get(25) is None
+
+    def test_is_fresh(self, tmp_path):
+        snapshot = DashboardSnapshots(str(tmp_path)).write(10, "{}")
+
+        assert snapshot.is_fresh(snapshot.etag, None)
+        assert snapshot.is_fresh(f'"other", W/{snapshot.etag}', None)
+        assert not snapshot.is_fresh('"other"', None)
+        assert snapshot.is_fresh(None, snapshot.last_modified)
+        assert not snapshot.is_fresh(None, "Mon, 01 Jan 2001 00:00:00 GMT")
+        assert not snapshot.is_fresh(None, "not a date")
+        assert not snapshot.is_fresh(None, None)
+        # If-None-Match takes precedence over If-Modified-Since.
+        assert not snapshot.is_fresh('"other"', snapshot.last_modified)
+
+    def test_file_snapshot_follows_content(self, tmp_path):
+        path = tmp_path / "dashboard.html"
+        path.write_text("<html>1</html>")
+        first = file_snapshot(str(path))
+        assert file_snapshot(str(path)) == first
+
+        path.write_text("<html>2</html>")
+        assert file_snapshot(str(path)).etag != first.etag
+
+
+class TestAssets:
+    def test_publishes_hashed_and_compressed_asset(self, tmp_path):
+        asset = publish_asset(str(tmp_path), "plotly.min.js", b"var a = 1;")
+
+        assert asset.name.startswith("plotly-") and asset.name.endswith(".min.js")
+        assert open(asset.path, "rb").read() == b"var a = 1;"
+        assert gzip.decompress(open(asset.gzip_path, "rb").read()) == b"var a = 1;"
+        assert publish_asset(str(tmp_path), "plotly.min.js", b"var a = 1;") == asset
+
+        changed = publish_asset(str(tmp_path), "plotly.min.js", b"var a = 2;")
+        assert changed.name != asset.name
+        assert changed.etag != asset.etag
+
+    def test_accepts_gzip(self):
+        assert accepts_gzip("gzip, deflate, br")
+        assert accepts_gzip("br;q=1.0, gzip;q=0.8")
+        assert accepts_gzip("*")
+        assert not accepts_gzip("gzip;q=0")
+        assert accepts_gzip("*;q=0, gzip")
+        assert accepts_gzip("br, *;q=0, gzip;q=0.5")
+        assert not accepts_gzip("gzip;q=0, *")
+        assert not accepts_gzip("gzip;q=0.0")
+        assert not accepts_gzip("gzip;q=x")
+        assert not accepts_gzip("br")
+        assert not accepts_gzip(None)
+
+
+class IncrementalStatistics:
+    """The analysis tables as `_apply_changes` and `_apply_deltas` update them."""
+
+    def __init__(self, organizations):
+        # Organizations of the main database, id -> (name, type).
+        self.organizations = organizations
+        self.contributions = {}
+        self.counts = {}
+        self.by_name = Counter()
+        self.by_type = {}
+
+    def apply(self, studies):
+        previous = {
+            study_id: self.contributions[study_id]
+            for study_id, _ in studies
+            if study_id in self.contributions
+        }
+        deltas, moved = study_deltas(previous, studies)
+        self.contributions.update(moved)
+
+        counts = {
+            org_id: self.counts.get(org_id, (*self.organizations[org_id], 0))
+            for org_id, delta in deltas.items()
+            if delta and org_id in self.organizations
+        }
+        changes = statistics_deltas(counts, deltas)
+        for org_id, count in changes.counts.items():
+            self.counts[org_id] = count
+            if count[2] <= 0:
+                del self.counts[org_id]
+        for name, delta in changes.organizations.items():
+            self.by_name[name] += delta
+            if self.by_name[name] <= 0:
+                del self.by_name[name]
+        for type_, delta in changes.type_studies.items():
+            studies_, organizations = self.by_type.get(type_, (0, 0))
+            self.by_type[type_] = (
+                studies_ + delta,
+                organizations + changes.type_organizations[type_],
+            )
+            if self.by_type[type_][0] <= 0:
+                del self.by_type[type_]
+        return len(moved)
+
+
+def rebuilt_statistics(organizations, studies):
+    """The statistics `_reconcile` builds from the whole `studies` table."""
+    quantities = Counter(org_id for org_id in studies.values() if org_id is not None)
+    counts = {
+        org_id: (*organizations[org_id], quantity)
+        for org_id, quantity in quantities.items()
+    }
+    by_name = Counter()
+    by_type = {}
+    for name, type_, quantity in counts.values():
+        if name is not None:
+            by_name[name] += quantity
+        if type_ is not None:
+            studies_, named = by_type.get(type_, (0, 0))
+            by_type[type_] = (studies_ + quantity, named + (name is not None))
+    return counts, by_name, by_type
+
+
+class TestStatisticsDeltas:
+    organizations = {
+        1: ("Acme", "INDUSTRY"),
+        2: ("Acme", "OTHER"),
+        3: ("Mayo", "OTHER"),
+        4: ("NIH", "FED"),
+        5: (None, "OTHER"),
+        6: ("Unknown", None),
+    }
+
+    def assert_matches_rebuild(self, statistics, studies):
+        assert (
+            statistics.counts,
+            statistics.by_name,
+            statistics.by_type,
+        ) == rebuilt_statistics(self.organizations, studies)
+
+    def test_moves_and_drops_to_zero(self):
+        statistics = IncrementalStatistics(self.organizations)
+        studies = {"NCT1": 1, "NCT2": 1, "NCT3": 4}
+        statistics.apply(list(studies.items()))
+        assert statistics.by_type["INDUSTRY"] == (2, 1)
+
+        # NCT1 moves between organizations of the same name but another type.
+        studies["NCT1"] = 2
+        assert statistics.apply([("NCT1", 2)]) == 1
+        self.assert_matches_rebuild(statistics, studies)
+        assert statistics.by_name["Acme"] == 2
+        assert statistics.by_type["OTHER"] == (1, 1)
+
+        # NCT2 leaves organization 1, its count and its type drop to zero.
+        studies["NCT2"] = 3
+        statistics.apply([("NCT2", 3)])
+        self.assert_matches_rebuild(statistics, studies)
+        assert 1 not in statistics.counts
+        assert "INDUSTRY" not in statistics.by_type
+        assert statistics.by_type["OTHER"] == (2, 2)
+
+    def test_type_organizations_follow_zero_crossings(self):
+        statistics = IncrementalStatistics(self.organizations)
+        studies = {"NCT1": 3, "NCT2": 3}
+        statistics.apply(list(studies.items()))
+        assert statistics.by_type["OTHER"] == (2, 1)
+
+        # One of two studies leaves, the organization still counts.
+        studies["NCT1"] = 4
+        statistics.apply([("NCT1", 4)])
+        assert statistics.by_type["OTHER"] == (1, 1)
+
+        # The last one leaves and another one arrives in the same batch.
+        studies.update(NCT2=4, NCT1=3)
+        statistics.apply([("NCT2", 4), ("NCT1", 3)])
+        self.assert_matches_rebuild(statistics, studies)
+        assert statistics.by_type["OTHER"] == (1, 1)
+
+    def test_overlap_rereads_change_nothing(self):
+        statistics = IncrementalStatistics(self.organizations)
+        studies = {"NCT1": 1, "NCT2": 4}
+        statistics.apply(list(studies.items()))
+        before = (dict(statistics.counts), Counter(statistics.by_name))
+
+        assert statistics.apply(list(studies.items())) == 0
+        assert (statistics.counts, statistics.by_name) == before
+
+    def test_null_organization_name_and_type(self):
+        statistics = IncrementalStatistics(self.organizations)
+        studies = {"NCT1": None, "NCT2": 5, "NCT3": 6}
+        assert statistics.apply(list(studies.items())) == 3
+        self.assert_matches_rebuild(statistics, studies)
+        # Unnamed organizations count studies for their type, not organizations.
+        assert statistics.by_type["OTHER"] == (1, 0)
+        assert statistics.by_name == {"Unknown": 1}
+
+        # A study loses its organization, then gets one again.
+        studies["NCT2"] = None
+        statistics.apply([("NCT2", None)])
+        self.assert_matches_rebuild(statistics, studies)
+        studies["NCT1"] = 3
+        statistics.apply([("NCT1", 3)])
+        self.assert_matches_rebuild(statistics, studies)
+
+    def test_random_batches_match_rebuild(self):
+        rng = random.Random(19)
+        org_ids = [*self.organizations, None]
+        statistics = IncrementalStatistics(self.organizations)
+        studies = {}
+
+        for _ in range(300):
+            changed = {
+                f"NCT{rng.randrange(40)}": rng.choice(org_ids)
+                for _ in range(rng.randint(1, 8))
+            }
+            studies.update(changed)
+            # Studies from the overlap window are read again unchanged.
+            reread = rng.sample(sorted(studies), min(len(studies), 3))
+            batch = {**{study_id: studies[study_id] for study_id in reread}, **changed}
+            statistics.apply(list(batch.items()))
+            self.assert_matches_rebuild(statistics, studies)
+
+
+class TestLoopLagMonitor:
+    def test_reports_blocking_code_as_stall(self):
+        monitor = LoopLagMonitor(interval=0.01, warn_after=0.1)
+
+        async def run():
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.05)
+            # Blocking call on the event loop.
+            time.sleep(0.2)
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(run())
+        report = monitor.report()
+        assert monitor.stalls == 1
+        assert report["max_ms"] >= 150
+        assert report["samples"] > 2
+
+
+class TestDebounce:
+    def run(self, notify_at, quiet=0.05, max_delay=0.3):
+        """Set the event at the `notify_at` offsets, return when `debounce` returned."""
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            changed = asyncio.Event()
+            started = loop.time()
+
+            async def notify():
+                for offset in notify_at:
+                    await asyncio.sleep(max(0, started + offset - loop.time()))
+                    changed.set()
+
+            notifier = asyncio.create_task(notify())
+            await debounce(changed, quiet, max_delay)
+            waited = loop.time() - started
+            notifier.cancel()
+            return waited, changed.is_set()
+
+        return asyncio.run(run())
+
+    def test_returns_after_a_quiet_period(self):
+        waited, pending = self.run([])
+        assert 0.04 <= waited < 0.15
+        assert not pending
+
+    def test_waits_for_the_burst_to_end(self):
+        waited, _ = self.run([0.02, 0.04, 0.06])
+        # The last notification at 0.06 s, then 0.05 s of quiet.
+        assert 0.1 <= waited < 0.25
+
+    def test_continuous_notifications_are_cut_at_max_delay(self):
+        waited, _ = self.run([i * 0.01 for i in range(100)])
+        assert 0.3 <= waited < 0.45
+
+    def test_coalesced_notifications_are_consumed(self):
+        async def run():
+            changed = asyncio.Event()
+            changed.set()
+            await debounce(changed, 0.02, 0.1)
+            return changed.is_set()
+
+        assert not asyncio.run(run())
+
+
+class TestChangeListener:
+    def test_wakes_up_on_notify(self):
+        # The listener runs against the main database the scraper writes to.
+        dsn = os.environ.get("SCRAPER_TEST_DATABASE_URL")
+        if not dsn:
+            pytest.skip("SCRAPER_TEST_DATABASE_URL is not set")
+
+        async def run():
+            listener = ChangeListener(dsn)
+            task = asyncio.create_task(listener.run())
+            try:
+                # Set once connected, notifications sent before are lost.
+                await asyncio.wait_for(listener.changed.wait(), 5)
+                listener.changed.clear()
+
+                connection = psycopg2.connect(dsn)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"NOTIFY {CHANNEL}, 'INSERT'")
+                connection.close()
+                await asyncio.wait_for(listener.changed.wait(), 5)
+            finally:
+                task.cancel()
+
+        asyncio.run(run())
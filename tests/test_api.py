@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from fastapi import status
 
-from api.db.models import Study
+from db.models import Organization, Study
 
 
 @pytest.mark.usefixtures("db")
@@ -25,6 +25,24 @@ class TestStudyEndpoints:
         assert "created_at" in data
         assert "updated_at" in data
 
+    def test_create_studies_share_organization(self, client, db):
+        study_data = {
+            "organization_name": "Shared Org",
+            "organization_type": "Academic",
+        }
+        first = client.post("/api/studies/", json={"title": "First", **study_data})
+        second = client.post("/api/studies/", json={"title": "Second", **study_data})
+        assert first.status_code == status.HTTP_201_CREATED
+        assert second.status_code == status.HTTP_201_CREATED
+
+        organizations = db.query(Organization).all()
+        assert [(org.name, org.type) for org in organizations] == [
+            ("Shared Org", "Academic")
+        ]
+        assert {study.organization_id for study in db.query(Study).all()} == {
+            organizations[0].id
+        }
+
     def test_get_studies_empty(self, client):
         response = client.get("/api/studies/")
         assert response.status_code == status.HTTP_200_OK
@@ -38,8 +56,7 @@ class TestStudyEndpoints:
         study1 = Study(
             id=str(uuid.uuid4()),
             title="Study 1",
-            organization_name="Org 1",
-            organization_type="Academic",
+            organization=Organization(name="Org 1", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -47,8 +64,7 @@ class TestStudyEndpoints:
         study2 = Study(
             id=str(uuid.uuid4()),
             title="Study 2",
-            organization_name="Org 2",
-            organization_type="Commercial",
+            organization=Organization(name="Org 2", type="Commercial"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -75,8 +91,7 @@ class TestStudyEndpoints:
         study = Study(
             id=study_id,
             title="Test Study",
-            organization_name="Test Org",
-            organization_type="Academic",
+            organization=Organization(name="Test Org", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -110,8 +125,7 @@ class TestStudyEndpoints:
         study = Study(
             id=study_id,
             title="Original Title",
-            organization_name="Original Org",
-            organization_type="Academic",
+            organization=Organization(name="Original Org", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -149,8 +163,7 @@ class TestStudyEndpoints:
         study = Study(
             id=study_id,
             title="Study to Delete",
-            organization_name="Delete Org",
-            organization_type="Academic",
+            organization=Organization(name="Delete Org", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -182,8 +195,7 @@ class TestStudyEndpoints:
         study1 = Study(
             id=str(uuid.uuid4()),
             title="Machine Learning Study",
-            organization_name="Org 1",
-            organization_type="Academic",
+            organization=Organization(name="Org 1", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -191,8 +203,7 @@ class TestStudyEndpoints:
         study2 = Study(
             id=str(uuid.uuid4()),
             title="Data Science Research",
-            organization_name="Org 2",
-            organization_type="Commercial",
+            organization=Organization(name="Org 2", type="Commercial"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -221,8 +232,7 @@ class TestStudyEndpoints:
         study1 = Study(
             id=str(uuid.uuid4()),
             title="Study 1",
-            organization_name="University of Science",
-            organization_type="Academic",
+            organization=Organization(name="University of Science", type="Academic"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -230,8 +240,7 @@ class TestStudyEndpoints:
         study2 = Study(
             id=str(uuid.uuid4()),
             title="Study 2",
-            organization_name="Tech Company",
-            organization_type="Commercial",
+            organization=Organization(name="Tech Company", type="Commercial"),
             created_at=datetime.now(),
             updated_at=datetime.now(),
         )
@@ -256,8 +265,7 @@ class TestStudyEndpoints:
             study = Study(
                 id=str(uuid.uuid4()),
                 title=f"Study {i + 1}",
-                organization_name=f"Org {i + 1}",
-                organization_type="Academic",
+                organization=Organization(name=f"Org {i + 1}", type="Academic"),
                 created_at=datetime.now(),
                 updated_at=datetime.now(),
             )
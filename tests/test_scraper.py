@@ -0,0 +1,974 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from scraper.data_parser import (
+    AdaptiveRateLimiter,
+    ClinicalTrialsCollector,
+    HttpCache,
+    StudyCollector,
+    StudyRecord,
+    StudySearchAreasCollector,
+)
+from scraper.archive import LEGACY_FIELDS, PageArchive
+from scraper.db.bulk import study_content_hash
+from scraper.db.index import KnownStudyIndex, study_key
+from scraper.db.queue import WorkQueue
+from scraper.replay import RecordingTransport, ReplayTransport
+from scraper.scheduler import Job, Scheduler
+
+
+def _study(nct_id, title="Study", organization=None):
+    identification = {"nctId": nct_id, "briefTitle": title}
+    if organization is not None:
+        identification["organization"] = organization
+    return {"protocolSection": {"identificationModule": identification}}
+
+
+def _use_transport(handler):
+    ClinicalTrialsCollector._client = httpx.AsyncClient(
+        base_url="https://clinicaltrials.gov/api/v2/",
+        transport=httpx.MockTransport(handler),
+    )
+    ClinicalTrialsCollector._rate_limiter = AdaptiveRateLimiter(
+        max_rate=1000, burst=100
+    )
+
+
+class TestStudyCollector:
+    def teardown_method(self):
+        asyncio.run(ClinicalTrialsCollector.close())
+
+    def test_parse_dto_list(self):
+        json_data = {
+            "studies": [
+                _study("NCT1", "First", {"fullName": "Org 1", "class": "OTHER"}),
+                _study("NCT2", "Second"),
+                {"derivedSection": {}},
+            ],
+            "nextPageToken": "token-2",
+        }
+
+        dto_list = StudyCollector.parse_dto_list(json_data)
+
+        assert dto_list.next_page_token == "token-2"
+        assert [dto.id for dto in dto_list.studies] == ["NCT1", "NCT2"]
+        assert dto_list.studies[0].organization.name == "Org 1"
+        assert dto_list.studies[0].organization.type == "OTHER"
+        assert dto_list.studies[1].organization is None
+
+    def test_parse_raw_page(self):
+        raw = json.dumps(
+            {
+                "studies": [
+                    _study("NCT1", 'Says "nextPageToken": "fake"'),
+                    _study("NCT2"),
+                ],
+                "nextPageToken": "token-2",
+            }
+        ).encode()
+
+        assert StudyCollector.find_next_page_token(raw) == "token-2"
+        assert [dto.id for dto in StudyCollector.parse_raw_page(raw)] == [
+            "NCT1",
+            "NCT2",
+        ]
+
+        last_page = json.dumps({"studies": [_study("NCT1", '"nextPageToken"')]})
+        assert StudyCollector.find_next_page_token(last_page.encode()) is None
+
+    def test_parse_records(self):
+        first = _study("NCT1", "First", {"fullName": "Org 1", "class": "OTHER"})
+        first["protocolSection"]["statusModule"] = {
+            "lastUpdatePostDateStruct": {"date": "2024-05", "type": "ACTUAL"}
+        }
+        raw = json.dumps(
+            {
+                "studies": [first, {"derivedSection": {}}, _study("NCT2", None)],
+                "nextPageToken": "token-2",
+            }
+        ).encode()
+
+        records, next_page_token = StudyCollector.parse_records(raw)
+
+        assert next_page_token == "token-2"
+        assert records == [
+            StudyRecord("NCT1", "First", "Org 1", "OTHER", date(2024, 5, 1)),
+            StudyRecord("NCT2", None, None, None, None),
+        ]
+        assert StudyCollector.parse_records(b'{"studies": []}') == ([], None)
+
+    def test_updated_since_params(self):
+        params = StudyCollector.updated_since_params(date(2024, 3, 7))
+
+        assert params == {
+            "filter.advanced": "AREA[LastUpdatePostDate]RANGE[2024-03-07,MAX]",
+            "sort": "LastUpdatePostDate:asc",
+        }
+        # Zero-padded ISO dates, and a datetime watermark loses its time.
+        assert StudyCollector.updated_since_params(datetime(2024, 1, 2, 23, 59)) == {
+            "filter.advanced": "AREA[LastUpdatePostDate]RANGE[2024-01-02,MAX]",
+            "sort": "LastUpdatePostDate:asc",
+        }
+
+    def test_updated_since_request(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"studies": []})
+
+        _use_transport(handler)
+        collector = StudyCollector()
+        asyncio.run(
+            collector.get_dto_list(
+                **collector.updated_since_params(date(2024, 3, 7)), pageSize=10
+            )
+        )
+
+        params = requests[0].url.params
+        assert (
+            params["filter.advanced"] == "AREA[LastUpdatePostDate]RANGE[2024-03-07,MAX]"
+        )
+        assert params["sort"] == "LastUpdatePostDate:asc"
+
+    def test_get_dto_list_drops_empty_params(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"studies": [_study("NCT1")]})
+
+        _use_transport(handler)
+        dto_list = asyncio.run(
+            StudyCollector().get_dto_list(pageSize=10, pageToken=None)
+        )
+
+        assert [dto.id for dto in dto_list.studies] == ["NCT1"]
+        assert requests[0].url.path == "/api/v2/studies"
+        params = dict(requests[0].url.params)
+        assert params["pageSize"] == "10"
+        assert "pageToken" not in params
+        assert params["fields"] == ",".join(StudyCollector.fields)
+
+    def test_requests_respect_concurrency(self):
+        in_flight = 0
+        peak = 0
+
+        async def run():
+            async def handler(request):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+                token = request.url.params["pageToken"]
+                return httpx.Response(200, json={"studies": [_study(token)]})
+
+            _use_transport(handler)
+            collector = StudyCollector(concurrency=2)
+            return await asyncio.gather(
+                *(collector.get_raw_data(pageToken=str(i)) for i in range(6))
+            )
+
+        pages = asyncio.run(run())
+
+        assert [StudyCollector.parse_records(raw)[0][0].id for raw in pages] == [
+            str(i) for i in range(6)
+        ]
+        assert peak == 2
+
+    def test_stream_dto_list_yields_studies_while_reading(self):
+        body = json.dumps(
+            {
+                "studies": [
+                    _study("NCT1", "First", {"fullName": "Org 1", "class": "OTHER"}),
+                    {"derivedSection": {"nested": {"protocolSection": {}}}},
+                    _study("NCT2", "Second"),
+                ],
+                "nextPageToken": "token-2",
+            }
+        ).encode()
+
+        class ChunkedBody(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                for start in range(0, len(body), 7):
+                    end = start + 7
+                    yield body[start:end]
+
+        _use_transport(lambda request: httpx.Response(200, stream=ChunkedBody()))
+
+        async def run():
+            stream = StudyCollector().stream_dto_list(pageSize=2)
+            assert stream.next_page_token is None
+            return [dto async for dto in stream], stream.next_page_token
+
+        studies, next_page_token = asyncio.run(run())
+
+        assert [dto.id for dto in studies] == ["NCT1", "NCT2"]
+        assert studies[0].organization.name == "Org 1"
+        assert next_page_token == "token-2"
+
+    def test_retries_throttled_requests(self, monkeypatch):
+        monkeypatch.setattr(ClinicalTrialsCollector, "retry_backoff", 0.001)
+        statuses = iter([429, 503, 200])
+
+        def handler(request):
+            status = next(statuses)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={"studies": [_study("NCT1")]})
+
+        _use_transport(handler)
+        rate_limiter = ClinicalTrialsCollector._rate_limiter
+        dto_list = asyncio.run(StudyCollector().get_dto_list())
+
+        assert [dto.id for dto in dto_list.studies] == ["NCT1"]
+        assert rate_limiter.rate < rate_limiter.max_rate
+
+    def test_gives_up_after_max_retries(self, monkeypatch):
+        monkeypatch.setattr(ClinicalTrialsCollector, "retry_backoff", 0.001)
+        monkeypatch.setattr(ClinicalTrialsCollector, "max_retries", 2)
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(502)
+
+        _use_transport(handler)
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(StudyCollector().get_dto_list())
+        assert len(calls) == 3
+
+    def test_does_not_retry_client_errors(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400)
+
+        _use_transport(handler)
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(StudyCollector().get_dto_list())
+        assert len(calls) == 1
+
+
+SEARCH_AREAS = [
+    {
+        "name": "Study",
+        "areas": [
+            {
+                "name": "ConditionSearch",
+                "param": "cond",
+                "uiLabel": "Conditions",
+                "parts": [
+                    {"weight": 0.95, "fields": ["Condition", "BriefTitle"]},
+                    {"weight": 0.5, "fields": ["Keyword", "Condition"]},
+                ],
+            },
+            {"name": "BasicSearch", "param": "term", "parts": []},
+        ],
+    }
+]
+
+
+class TestStudySearchAreasCollector:
+    def teardown_method(self):
+        asyncio.run(ClinicalTrialsCollector.close())
+
+    def test_parse_dto_list(self):
+        areas = StudySearchAreasCollector.parse_dto_list(SEARCH_AREAS).areas
+
+        assert [(area.document, area.name) for area in areas] == [
+            ("Study", "ConditionSearch"),
+            ("Study", "BasicSearch"),
+        ]
+        assert areas[0].ui_label == "Conditions"
+        assert areas[0].fields == ["Condition", "BriefTitle", "Keyword"]
+        assert areas[1].fields == []
+
+    def test_unchanged_taxonomy_costs_a_304(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ClinicalTrialsCollector, "_cache", HttpCache(str(tmp_path)))
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, json=SEARCH_AREAS, headers={"ETag": '"v1"'})
+
+        _use_transport(handler)
+        collector = StudySearchAreasCollector()
+        first = asyncio.run(collector.get_dto_list(changed_only=True))
+        second = asyncio.run(collector.get_dto_list(changed_only=True))
+        third = asyncio.run(collector.get_dto_list())
+
+        assert len(first.areas) == 2
+        assert second is None
+        assert third == first
+        assert "If-None-Match" not in requests[0].headers
+        assert requests[1].headers["If-None-Match"] == '"v1"'
+
+    def test_same_body_without_validators_is_unchanged(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ClinicalTrialsCollector, "_cache", HttpCache(str(tmp_path)))
+        bodies = iter([{"totalCount": 5}, {"totalCount": 5}, {"totalCount": 6}])
+        _use_transport(lambda request: httpx.Response(200, json=next(bodies)))
+        collector = StudyCollector()
+
+        results = [
+            asyncio.run(collector.get_cached_raw_data(countTotal="true"))
+            for _ in range(3)
+        ]
+
+        assert [(json.loads(raw), changed) for raw, changed in results] == [
+            ({"totalCount": 5}, True),
+            ({"totalCount": 5}, False),
+            ({"totalCount": 6}, True),
+        ]
+
+
+class TestRecordAndReplay:
+    def teardown_method(self):
+        asyncio.run(ClinicalTrialsCollector.close())
+
+    def _set_transport(self, transport):
+        ClinicalTrialsCollector._client = httpx.AsyncClient(
+            base_url="https://clinicaltrials.gov/api/v2/", transport=transport
+        )
+        ClinicalTrialsCollector._rate_limiter = AdaptiveRateLimiter(
+            max_rate=1000, burst=100
+        )
+
+    def _record(self, path):
+        def handler(request):
+            token = request.url.params.get("pageToken", "0")
+            return httpx.Response(
+                200,
+                json={
+                    "studies": [_study(f"NCT{token}")],
+                    "nextPageToken": str(int(token) + 1),
+                },
+            )
+
+        self._set_transport(RecordingTransport(path, httpx.MockTransport(handler)))
+        collector = StudyCollector()
+        asyncio.run(collector.get_dto_list(pageSize=5))
+        asyncio.run(collector.get_dto_list(pageSize=5, pageToken="1"))
+
+    def test_replays_recorded_pages(self, tmp_path):
+        path = str(tmp_path / "pages.ndjson.gz")
+        self._record(path)
+
+        self._set_transport(ReplayTransport(path))
+        collector = StudyCollector()
+        first = asyncio.run(collector.get_dto_list(pageSize=5))
+        second = asyncio.run(
+            collector.get_dto_list(pageSize=5, pageToken=first.next_page_token)
+        )
+
+        assert [dto.id for dto in first.studies] == ["NCT0"]
+        assert [dto.id for dto in second.studies] == ["NCT1"]
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(collector.get_dto_list(pageSize=5, pageToken="7"))
+
+    def test_injected_errors_are_retried(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ClinicalTrialsCollector, "retry_backoff", 0.001)
+        monkeypatch.setattr(ClinicalTrialsCollector, "max_retries", 50)
+        path = str(tmp_path / "pages.ndjson.gz")
+        self._record(path)
+
+        transport = ReplayTransport(path, error_rate=0.5, seed=1)
+        self._set_transport(transport)
+        dto_list = asyncio.run(StudyCollector().get_dto_list(pageSize=5))
+
+        assert [dto.id for dto in dto_list.studies] == ["NCT0"]
+
+    def test_replays_revalidated_response_into_empty_cache(self, tmp_path, monkeypatch):
+        def handler(request):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, json=SEARCH_AREAS, headers={"ETag": '"v1"'})
+
+        path = str(tmp_path / "pages.ndjson.gz")
+        monkeypatch.setattr(
+            ClinicalTrialsCollector, "_cache", HttpCache(str(tmp_path / "recorded"))
+        )
+        self._set_transport(RecordingTransport(path, httpx.MockTransport(handler)))
+        collector = StudySearchAreasCollector()
+        asyncio.run(collector.get_dto_list())
+        asyncio.run(collector.get_dto_list())
+
+        monkeypatch.setattr(
+            ClinicalTrialsCollector, "_cache", HttpCache(str(tmp_path / "replayed"))
+        )
+        self._set_transport(ReplayTransport(path))
+        first = asyncio.run(collector.get_dto_list(changed_only=True))
+        second = asyncio.run(collector.get_dto_list(changed_only=True))
+
+        assert len(first.areas) == 2
+        assert second is None
+
+    def test_not_modified_without_cached_body_is_a_miss(self, tmp_path):
+        path = str(tmp_path / "pages.ndjson.gz")
+        recorder = RecordingTransport(
+            path, httpx.MockTransport(lambda request: httpx.Response(304))
+        )
+        url = "https://clinicaltrials.gov/api/v2/studies/search-areas"
+        conditional = httpx.Request("GET", url, headers={"If-None-Match": '"v1"'})
+        asyncio.run(recorder.handle_async_request(conditional))
+
+        replay = ReplayTransport(path)
+        plain = asyncio.run(replay.handle_async_request(httpx.Request("GET", url)))
+        revalidated = asyncio.run(replay.handle_async_request(conditional))
+
+        assert plain.status_code == 404
+        assert revalidated.status_code == 304
+
+
+class TestPageArchive:
+    def test_stores_identical_pages_once(self, tmp_path):
+        archive = PageArchive(str(tmp_path))
+        first = archive.put(b'{"studies": [1]}', "studies", {"pageToken": None})
+        second = archive.put(b'{"studies": [2]}', "studies", {"pageToken": "2"})
+        again = archive.put(b'{"studies": [1]}', "studies_delta")
+
+        assert again == first
+        assert archive.get(first) == b'{"studies": [1]}'
+        assert len(list(tmp_path.glob("objects/*/*.json.gz"))) == 2
+        assert [entry["crawl"] for entry in archive.manifest()] == [
+            "studies",
+            "studies",
+            "studies_delta",
+        ]
+        assert next(archive.manifest())["params"] == {}
+        # Ordered by the last fetch, so newer pages are applied last.
+        assert archive.latest_digests() == [second, first]
+
+    def test_ignores_incomplete_manifest_line(self, tmp_path):
+        archive = PageArchive(str(tmp_path))
+        digest = archive.put(b"{}", "studies")
+        with open(archive.manifest_path, "a") as file:
+            file.write('{"digest": "trunc')
+
+        assert archive.latest_digests() == [digest]
+
+    def test_prune_drops_least_recently_fetched_pages(self, tmp_path):
+        archive = PageArchive(str(tmp_path))
+        pages = [bytes(range(256)) * (i + 1) for i in range(3)]
+        first, second, third = (archive.put(page, "studies") for page in pages)
+        archive.put(pages[0], "studies")
+        size = os.path.getsize(archive.object_path(first))
+
+        archive.max_bytes = sum(
+            os.path.getsize(archive.object_path(digest)) for digest in (first, third)
+        )
+        assert archive.prune() == 1
+        assert archive.latest_digests() == [third, first]
+        assert not os.path.exists(archive.object_path(second))
+        # The manifest keeps one line per remaining page.
+        assert len(list(archive.manifest())) == 2
+
+        archive.max_bytes = size
+        assert archive.prune() == 1
+        assert archive.latest_digests() == [first]
+
+    def test_reports_pages_missing_fields(self, tmp_path):
+        archive = PageArchive(str(tmp_path))
+        archive.put(b"{}", "studies")
+        archive.put(b"[]", "studies", fields=["a"])
+        with open(archive.manifest_path, "a") as file:
+            # Written before the manifest recorded the projection.
+            file.write(json.dumps({"digest": "0" * 64, "crawl": "studies"}) + "\n")
+
+        entries = archive.latest_entries()
+        assert entries[0]["fields"] == []
+        # Only the legacy page lacks "a".
+        assert PageArchive.missing_fields(entries, ["a"]) == (1, {"a"})
+        assert PageArchive.missing_fields(entries, ["a", "b"]) == (2, {"a", "b"})
+        assert PageArchive.missing_fields(entries, LEGACY_FIELDS) == (
+            1,
+            set(LEGACY_FIELDS),
+        )
+
+
+class TestAdaptiveRateLimiter:
+    def test_backs_off_and_recovers(self):
+        rate_limiter = AdaptiveRateLimiter(max_rate=4, min_rate=1)
+
+        rate_limiter.on_throttle()
+        assert rate_limiter.rate == 2
+        rate_limiter.on_throttle()
+        rate_limiter.on_throttle()
+        assert rate_limiter.rate == 1
+
+        for _ in range(100):
+            rate_limiter.on_success()
+        assert rate_limiter.rate == 4
+
+    def test_limits_request_rate(self):
+        rate_limiter = AdaptiveRateLimiter(max_rate=50, burst=1)
+
+        async def run():
+            started = time.monotonic()
+            for _ in range(6):
+                await rate_limiter.acquire()
+            return time.monotonic() - started
+
+        assert asyncio.run(run()) >= 0.09
+
+
+def _run_scheduler(jobs, seconds):
+    async def run():
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(seconds):
+                await Scheduler(jobs).run()
+
+    asyncio.run(run())
+
+
+class TestScheduler:
+    def test_restarts_failing_job_with_backoff(self):
+        calls = []
+
+        async def flaky():
+            calls.append(time.monotonic())
+            if len(calls) < 3:
+                raise RuntimeError("boom")
+
+        job = Job("flaky", flaky, interval=10, backoff=0.05)
+        other = Job("other", lambda: asyncio.sleep(0), interval=0.05)
+        _run_scheduler([job, other], 0.5)
+
+        assert len(calls) == 3
+        # 0.05s after the first failure, 0.1s after the second
+        assert calls[2] - calls[1] >= 0.09
+        assert job.stats.failures == 2
+        assert job.stats.consecutive_failures == 0
+        assert other.stats.runs > 3
+
+    def test_times_out_runs(self):
+        job = Job("slow", lambda: asyncio.sleep(10), interval=1, timeout=0.05)
+        _run_scheduler([job], 0.2)
+
+        assert job.stats.failures == 1
+        assert "TimeoutError" in job.stats.last_error
+
+    def test_skips_ticks_missed_by_slow_runs(self):
+        skip = Job("skip", lambda: asyncio.sleep(0.22), interval=0.1)
+        delay = Job("delay", lambda: asyncio.sleep(0.22), interval=0.1, overlap="delay")
+        _run_scheduler([skip, delay], 0.5)
+
+        # Runs start at 0 and 0.3, skipping the ticks at 0.1 and 0.2, vs back
+        # to back at 0, 0.22 and 0.44.
+        assert skip.stats.runs == 2
+        assert skip.stats.skipped == 2
+        assert delay.stats.runs == 3
+        assert delay.stats.max_lag > 0.1
+
+    def test_uses_retry_hint(self):
+        hints = [0.05, None]
+        job = Job("hinted", lambda: asyncio.sleep(0, hints.pop(0)), interval=10)
+        _run_scheduler([job], 0.2)
+
+        assert job.stats.runs == 2
+
+
+class TestStudyContentHash:
+    def test_ignores_whitespace_differences(self):
+        assert study_content_hash("A  study ", "Org", "OTHER") == study_content_hash(
+            "A study", "Org", "OTHER"
+        )
+
+    def test_detects_changes(self):
+        base = study_content_hash("A study", "Org", "OTHER")
+        assert study_content_hash("A study", "Org", "INDUSTRY") != base
+        assert study_content_hash("A study", None, "OTHER") != base
+        assert study_content_hash("A study", "", "OTHER") != study_content_hash(
+            "A study", None, "OTHER"
+        )
+
+
+class TestKnownStudyIndex:
+    def test_study_key(self):
+        assert study_key("NCT01234567") == 1234567
+        assert study_key("OTHER-1") >= 1 << 63
+        assert study_key("OTHER-1") == study_key("OTHER-1")
+
+    def test_tracks_committed_hashes(self):
+        index = KnownStudyIndex(merge_threshold=2)
+        first = study_content_hash("First", None, None)
+        second = study_content_hash("Second", None, None)
+
+        assert not index.is_unchanged("NCT1", first)
+        index.update([("NCT1", first), ("NCT2", first)])
+        assert len(index) == 2
+        index.update([("NCT2", second), ("OTHER-1", second)])
+
+        assert index.is_unchanged("NCT1", first)
+        assert not index.is_unchanged("NCT2", first)
+        assert index.is_unchanged("NCT2", second)
+        assert index.is_unchanged("OTHER-1", second)
+        assert len(index) == 3
+
+
+class TestCrawlPipeline:
+    # Three pages of 5, 4 and 1 studies, chained by page tokens.
+    pages = {
+        None: (["NCT1", "NCT2", "NCT3", "NCT4", "NCT5"], "t2"),
+        "t2": (["NCT6", "NCT7", "NCT8", "NCT9"], "t3"),
+        "t3": (["NCT10"], None),
+    }
+
+    @pytest.fixture(autouse=True)
+    def crawl(self, scraper_tasks, monkeypatch):
+        self.tasks = scraper_tasks
+        self.writes = []
+        collector = scraper_tasks.StudyCollector.__mro__[1]
+        monkeypatch.setattr(collector, "rate_limit", 1000)
+        monkeypatch.setattr(scraper_tasks.settings, "archive_path", None)
+        monkeypatch.setattr(scraper_tasks.settings, "stream_pages", True)
+        monkeypatch.setattr(scraper_tasks.settings, "write_chunk_size", 2)
+        monkeypatch.setattr(scraper_tasks.settings, "pipeline_queue_size", 1)
+
+        def store(cls, studies, page_token, next_page_token, page_done=True, **kwargs):
+            self.writes.append(
+                (
+                    [study.id for study in studies],
+                    page_token,
+                    next_page_token,
+                    page_done,
+                )
+            )
+            return len(studies)
+
+        monkeypatch.setattr(
+            scraper_tasks.CollectStudiesTask, "_store", classmethod(store)
+        )
+        self.collector = collector
+        yield
+        asyncio.run(collector.close())
+        collector._transport = None
+
+    def run_crawl(self, handler, stream=True):
+        self.tasks.settings.stream_pages = stream
+        self.collector._transport = httpx.MockTransport(handler)
+
+        async def run():
+            collector = self.tasks.StudyCollector()
+            await asyncio.wait_for(
+                self.tasks.CollectStudiesTask._crawl(collector, None), 5
+            )
+
+        asyncio.run(run())
+
+    def serve(self, request):
+        ids, next_page_token = self.pages[request.url.params.get("pageToken")]
+        body = {"studies": [_study(nct_id) for nct_id in ids]}
+        if next_page_token:
+            body["nextPageToken"] = next_page_token
+        return httpx.Response(200, json=body)
+
+    def test_streams_pages_in_chunks(self):
+        self.run_crawl(self.serve)
+
+        # Only the last chunk of a page carries the next token and moves the cursor.
+        assert self.writes == [
+            (["NCT1", "NCT2"], None, None, False),
+            (["NCT3", "NCT4"], None, None, False),
+            (["NCT5"], None, "t2", True),
+            (["NCT6", "NCT7"], "t2", None, False),
+            (["NCT8", "NCT9"], "t2", None, False),
+            ([], "t2", "t3", True),
+            (["NCT10"], "t3", None, True),
+        ]
+
+    def test_batched_pages_are_one_chunk(self):
+        self.run_crawl(self.serve, stream=False)
+
+        assert self.writes == [
+            (["NCT1", "NCT2", "NCT3", "NCT4", "NCT5"], None, "t2", True),
+            (["NCT6", "NCT7", "NCT8", "NCT9"], "t2", "t3", True),
+            (["NCT10"], "t3", None, True),
+        ]
+
+    def block_last_page(self, fetch_cancelled, reached):
+        async def handler(request):
+            if request.url.params.get("pageToken") == "t3":
+                reached.set()
+                try:
+                    await asyncio.sleep(30)
+                except asyncio.CancelledError:
+                    fetch_cancelled.append(True)
+                    raise
+            return self.serve(request)
+
+        return handler
+
+    @pytest.mark.parametrize("stream", [True, False])
+    def test_failed_write_cancels_the_fetch(self, stream, monkeypatch):
+        fetch_cancelled = []
+        reached = threading.Event()
+        monkeypatch.setattr(self.tasks.settings, "pipeline_queue_size", 10)
+
+        def store(cls, *args, **kwargs):
+            # Fails once the fetch is waiting for the last page.
+            reached.wait(5)
+            raise RuntimeError("database is down")
+
+        monkeypatch.setattr(self.tasks.CollectStudiesTask, "_store", classmethod(store))
+        with pytest.raises(ExceptionGroup) as group:
+            self.run_crawl(self.block_last_page(fetch_cancelled, reached), stream)
+
+        assert [str(e) for e in group.value.exceptions] == ["database is down"]
+        assert fetch_cancelled == [True]
+
+    def test_failed_parse_cancels_the_fetch(self, monkeypatch):
+        fetch_cancelled = []
+        reached = threading.Event()
+        monkeypatch.setattr(self.tasks.settings, "pipeline_queue_size", 10)
+        parse_records = self.tasks.StudyCollector.parse_records
+
+        def parse(raw):
+            if b"NCT6" in raw:
+                reached.wait(5)
+                raise ValueError("malformed page")
+            return parse_records(raw)
+
+        monkeypatch.setattr(
+            self.tasks.StudyCollector, "parse_records", staticmethod(parse)
+        )
+        with pytest.raises(ExceptionGroup) as group:
+            self.run_crawl(self.block_last_page(fetch_cancelled, reached), stream=False)
+
+        assert [str(e) for e in group.value.exceptions] == ["malformed page"]
+        assert fetch_cancelled == [True]
+        assert [write[1] for write in self.writes] == [None]
+
+    @pytest.mark.parametrize("stream", [True, False])
+    def test_failed_fetch_cancels_the_other_stages(self, stream):
+        def handler(request):
+            if request.url.params.get("pageToken") == "t2":
+                return httpx.Response(400, json={"error": "bad page token"})
+            return self.serve(request)
+
+        # The crawl ends although the later stages wait for more pages.
+        with pytest.raises(ExceptionGroup) as group:
+            self.run_crawl(handler, stream=stream)
+
+        assert [type(e) for e in group.value.exceptions] == [httpx.HTTPStatusError]
+        assert {write[1] for write in self.writes} <= {None}
+
+
+class TestCrawlResume:
+    pages = TestCrawlPipeline.pages
+
+    @pytest.fixture(autouse=True)
+    def crawl(self, scraper_tasks, scraper_db, monkeypatch):
+        self.tasks = scraper_tasks
+        self.db = scraper_db
+        self.requests = []
+        collector = scraper_tasks.StudyCollector.__mro__[1]
+        monkeypatch.setattr(collector, "rate_limit", 1000)
+        monkeypatch.setattr(collector, "max_retries", 0)
+        monkeypatch.setattr(scraper_tasks.settings, "archive_path", None)
+        monkeypatch.setattr(scraper_tasks.settings, "stream_pages", True)
+        self.collector = collector
+        yield
+        asyncio.run(collector.close())
+        collector._transport = None
+
+    def run_pass(self, rejected=()):
+        def handler(request):
+            page_token = request.url.params.get("pageToken")
+            self.requests.append(page_token)
+            if page_token in rejected:
+                return httpx.Response(400, json={"error": "invalid pageToken"})
+            return TestCrawlPipeline.serve(self, request)
+
+        self.collector._transport = httpx.MockTransport(handler)
+        asyncio.run(self.tasks.CollectStudiesTask.run_once())
+
+    def crawl_state(self):
+        db = self.db()
+        try:
+            state = db.get(self.tasks.CrawlState, "studies")
+            studies = db.execute(text("SELECT count(*) FROM studies")).scalar_one()
+            return state.page_token, state.page_count, studies
+        finally:
+            db.close()
+
+    def test_resumes_from_the_checkpoint(self, monkeypatch):
+        task = self.tasks.CollectStudiesTask
+        store = task._store
+
+        def crash_on_last_page(*args, **kwargs):
+            if args[1] == "t3":
+                raise RuntimeError("killed")
+            return store(*args, **kwargs)
+
+        # Writing the last page fails, the cursor stays on it.
+        monkeypatch.setattr(task, "_store", crash_on_last_page)
+        with pytest.raises(ExceptionGroup):
+            self.run_pass()
+        assert self.crawl_state() == ("t3", 2, 9)
+        monkeypatch.setattr(task, "_store", store)
+
+        # The unit was handed back, the next pass resumes with the last page.
+        self.requests.clear()
+        self.run_pass()
+        assert self.requests == ["t3"]
+        assert self.crawl_state() == (None, 3, 10)
+
+    def test_rejected_page_token_starts_over(self):
+        db = self.db()
+        db.add(
+            self.tasks.CrawlState(name="studies", page_token="expired", page_count=7)
+        )
+        db.commit()
+        db.close()
+
+        self.run_pass(rejected={"expired"})
+
+        assert self.requests == ["expired", None, "t2", "t3"]
+        assert self.crawl_state() == (None, 3, 10)
+
+
+class TestWorkQueue:
+    @pytest.fixture(autouse=True)
+    def queue(self, scraper_tasks, scraper_db):
+        self.tasks = scraper_tasks
+        self.db = scraper_db
+        self.first = WorkQueue(lease_seconds=60, owner="first")
+        self.second = WorkQueue(lease_seconds=60, owner="second")
+        db = self.db()
+        self.first.enqueue(
+            db, [("a", "query a"), ("b", None), ("done", None)], ["done"]
+        )
+        db.commit()
+        db.close()
+
+    def call(self, queue, method, *args, **kwargs):
+        db = self.db()
+        try:
+            result = getattr(queue, method)(db, *args, **kwargs)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def expire(self, name):
+        db = self.db()
+        db.execute(
+            text(
+                "UPDATE crawl_queue SET lease_expires_at = LOCALTIMESTAMP - interval '1 second'"
+                " WHERE name = :name"
+            ),
+            {"name": name},
+        )
+        db.commit()
+        db.close()
+
+    def test_claims_each_due_unit_once(self):
+        first = self.call(self.first, "claim", ["a", "b", "done"])
+        second = self.call(self.second, "claim", ["a", "b", "done"])
+
+        assert {first.name, second.name} == {"a", "b"}
+        assert self.call(self.second, "claim", ["a", "b", "done"]) is None
+        assert self.call(self.first, "unfinished", ["a", "b", "done"]) == 2
+
+    def test_concurrent_claims_skip_locked_units(self):
+        db = self.db()
+        # An open transaction holds the row lock of its claim.
+        assert self.first.claim(db, ["a"]) == ("a", "query a")
+        assert self.call(self.second, "claim", ["a"]) is None
+        db.rollback()
+        db.close()
+
+        assert self.call(self.second, "claim", ["a"]) == ("a", "query a")
+
+    def test_expired_lease_moves_to_another_instance(self):
+        self.call(self.first, "claim", ["a"])
+        assert self.call(self.first, "heartbeat", "a")
+        assert not self.call(self.second, "heartbeat", "a")
+        assert self.call(self.second, "claim", ["a"]) is None
+
+        self.expire("a")
+        assert not self.call(self.first, "heartbeat", "a")
+        assert self.call(self.second, "claim", ["a"]).name == "a"
+        # Releasing a lease held by someone else changes nothing.
+        self.call(self.first, "release", "a", finished=True)
+        assert self.call(self.first, "unfinished", ["a"]) == 1
+
+    def test_release_makes_the_unit_due_later_or_finishes_it(self):
+        self.call(self.first, "claim", ["a", "b"])
+        self.call(self.first, "release", "a", available_in=3600)
+        assert self.call(self.second, "claim", ["a"]) is None
+
+        self.call(self.second, "claim", ["b"])
+        self.call(self.second, "release", "b", finished=True)
+        assert self.call(self.first, "claim", ["b"]) is None
+        assert self.call(self.first, "unfinished", ["a", "b"]) == 1
+
+        self.call(self.first, "enqueue", [("b", None)], restart=True)
+        assert self.call(self.first, "claim", ["b"]).name == "b"
+
+    def test_write_after_a_lost_lease_is_rolled_back(self, monkeypatch):
+        task = self.tasks.CollectStudiesTask
+        monkeypatch.setattr(task, "_queue", self.first)
+        self.call(self.first, "claim", ["a"])
+        record = self.tasks.StudyRecord("NCT1", "Study", None, None, None)
+        assert task._store([record], None, "t2", crawl_name="a") == 1
+
+        self.expire("a")
+        with pytest.raises(self.tasks.LeaseLost):
+            task._store([record._replace(id="NCT2")], "t2", "t3", crawl_name="a")
+
+        db = self.db()
+        assert db.execute(text("SELECT id FROM studies")).scalars().all() == ["NCT1"]
+        assert db.get(self.tasks.CrawlState, "a").page_token == "t2"
+        db.close()
+
+
+class TestBackfillPartitions:
+    def test_yearly_partitions_with_open_ends(self, scraper_tasks):
+        partitions = scraper_tasks.BackfillStudiesTask.partitions(2020, 2022)
+
+        assert partitions == [
+            (
+                "backfill:MIN:2020-12-31",
+                "AREA[LastUpdatePostDate]RANGE[MIN,2020-12-31]",
+            ),
+            (
+                "backfill:2021-01-01:2021-12-31",
+                "AREA[LastUpdatePostDate]RANGE[2021-01-01,2021-12-31]",
+            ),
+            (
+                "backfill:2022-01-01:MAX",
+                "AREA[LastUpdatePostDate]RANGE[2022-01-01,MAX]",
+            ),
+        ]
+
+    def test_single_year_covers_everything(self, scraper_tasks):
+        assert scraper_tasks.BackfillStudiesTask.partitions(2024, 2024) == [
+            ("backfill:MIN:MAX", "AREA[LastUpdatePostDate]RANGE[MIN,MAX]")
+        ]
+
+    def test_partitions_are_contiguous(self, scraper_tasks):
+        partitions = scraper_tasks.BackfillStudiesTask.partitions(2000, 2025)
+        ranges = [name.split(":")[1:] for name, _ in partitions]
+
+        assert len(partitions) == 26
+        assert len({name for name, _ in partitions}) == 26
+        assert ranges[0][0] == "MIN" and ranges[-1][1] == "MAX"
+        # Each partition starts the day after the previous one ends.
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            assert date.fromisoformat(high) + timedelta(days=1) == date.fromisoformat(
+                low
+            )